@@ -0,0 +1,116 @@
+import os
+
+import pandas as pd
+
+from batch import DEFAULT_CHUNKSIZE, match_feature_columns, predict_frame
+from features import NORMALIZED_COLUMNS, RAW_DATA, TARGET, FeatureStats, featurize
+from registry import BASE_DIR
+
+MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+          "August", "September", "October", "November", "December"]
+DIMENSIONS = {
+    "Ship": "ship_id",
+    "Route": "route_id",
+    "Fuel type": "fuel_type",
+    "Weather": "weather_conditions",
+}
+ACTUAL = "Actual CO2 (kg)"
+PREDICTED = "Predicted CO2 (kg)"
+# (rows, columns) of every precomputed rollup table.
+ROLLUPS = [
+    ("ship_id", "month"),
+    ("route_id", "month"),
+    ("fuel_type", "month"),
+    ("weather_conditions", "month"),
+    ("route_id", "weather_conditions"),
+    ("fuel_type", "weather_conditions"),
+    ("ship_id", "weather_conditions"),
+]
+
+
+def load_bundled_voyages():
+    return pd.read_csv(os.path.join(BASE_DIR, RAW_DATA))
+
+
+def model_features(voyages):
+    """The model's three input columns for `voyages`, or None when they cannot be derived.
+
+    Uses the columns directly when present; raw voyage logs with fuel consumption
+    and CO2 are featurized with the scaling fitted on the bundled training data.
+    """
+    try:
+        columns = match_feature_columns(voyages.columns)
+        return voyages[columns]
+    except ValueError:
+        pass
+    if {"fuel_consumption", TARGET}.issubset(voyages.columns):
+        stats = FeatureStats.fit(load_bundled_voyages())
+        return featurize(voyages, stats)[NORMALIZED_COLUMNS]
+    return None
+
+
+def _rollup(frame, rows, columns, measure):
+    grouped = frame.groupby([rows, columns], observed=True)[measure]
+    return pd.DataFrame({"total_kg": grouped.sum(), "voyages": grouped.size(), "mean_kg": grouped.mean()})
+
+
+class FleetAnalytics:
+    """Emission totals over voyage records, answered from rollup tables built once.
+
+    The constructor does the only pass over the raw rows: it casts the grouping
+    columns to categoricals and precomputes a total/count/mean table for every
+    pair in ROLLUPS. Every query afterwards slices or pivots one of those small
+    tables, so dashboards can re-query freely without rescanning the voyages.
+    """
+
+    def __init__(self, voyages, measures):
+        self.measures = list(measures)
+        frame = pd.DataFrame({col: voyages[col].astype("category") for col in DIMENSIONS.values()})
+        frame["month"] = pd.Categorical(voyages["month"], categories=MONTHS, ordered=True)
+        for measure, values in measures.items():
+            frame[measure] = values
+        self.voyages = len(frame)
+        self.rollups = {
+            measure: {(rows, cols): _rollup(frame, rows, cols, measure) for rows, cols in ROLLUPS}
+            for measure in self.measures
+        }
+
+    @classmethod
+    def from_voyages(cls, voyages, model=None, chunksize=DEFAULT_CHUNKSIZE):
+        """Build from raw voyage records, adding model predictions through the batch path when possible."""
+        missing = [col for col in list(DIMENSIONS.values()) + ["month"] if col not in voyages]
+        if missing:
+            raise ValueError(f"Voyage data is missing columns: {', '.join(missing)}")
+        measures = {}
+        if TARGET in voyages:
+            measures[ACTUAL] = voyages[TARGET].to_numpy()
+        features = model_features(voyages) if model is not None else None
+        if features is not None:
+            measures[PREDICTED] = predict_frame(model, features.set_axis(NORMALIZED_COLUMNS, axis=1), chunksize)
+        if not measures:
+            raise ValueError(f"Voyage data needs a {TARGET} column or the model's feature columns")
+        return cls(voyages, measures)
+
+    def _table(self, measure, rows, columns):
+        return self.rollups[measure][(rows, columns)]
+
+    def monthly(self, measure, dimension, keys=None, value="total_kg"):
+        """Month x key pivot of `value` for one dimension (e.g. ship_id), optionally limited to `keys`."""
+        table = self._table(measure, dimension, "month")[value].unstack(dimension)
+        if keys is not None:
+            table = table[[k for k in keys if k in table.columns]]
+        return table.reindex(MONTHS).dropna(how="all")
+
+    def totals(self, measure, dimension):
+        """Per-key totals over all months, largest first."""
+        table = self._table(measure, dimension, "month")
+        grouped = table.groupby(level=dimension, observed=True)
+        totals = pd.DataFrame({"total_kg": grouped["total_kg"].sum(), "voyages": grouped["voyages"].sum()})
+        totals["mean_kg"] = totals["total_kg"] / totals["voyages"]
+        return totals.sort_values("total_kg", ascending=False)
+
+    def weather_breakdown(self, measure, dimension=None, value="mean_kg"):
+        """`value` per weather condition, overall or split by route/fuel type/ship."""
+        if dimension is None:
+            return self.totals(measure, "weather_conditions")
+        return self._table(measure, dimension, "weather_conditions")[value].unstack("weather_conditions")
@@ -1,22 +1,148 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from joblib import load
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
-from fpdf import FPDF
-import io
-import tempfile
 import os
 import random
 import time
+import tracing
+from analytics import DIMENSIONS, FleetAnalytics, load_bundled_voyages
+from batch import DEFAULT_CHUNKSIZE, INTERVAL_COLUMNS, PREDICTION_COLUMN, predict_csv_stream
+from ensemble import ModelComparison, compare_csv_stream, prediction_column
+from inference import MODEL_FILES, load_model
+from prediction_cache import PredictionCache
+from report import ReportBuilder
+from suggestions import PAGE_SIZE, SuggestionStore
+from surface import SurfaceGrid, go, plotly_figure, png_cache, vega_lite_spec
+from sweep import DEFAULT_RESOLUTION, PREDICTION, scenario_distribution, scenario_sweep, to_surface
+from uncertainty import STD, predict_distribution, quantile_column, supports_intervals
+
+PREVIEW_ROWS = 100
+rerun_start = time.perf_counter()
 
 @st.cache_resource
+def load_cached_model(model_name):
+    tracing.count("get_model_miss", model=model_name)
+    with tracing.span("model_load", model=model_name):
+        return load_model(model_name)
+
 def get_model(model_name):
-    if model_name == "Random Forest":
-        return load("optimized_random_forest_model.joblib")
+    tracing.count("get_model", model=model_name)
+    return load_cached_model(model_name)
+
+@st.cache_resource
+def get_model_comparison():
+    return ModelComparison({name: get_model(name) for name in MODEL_FILES})
+
+@st.cache_resource
+def get_metrics_server():
+    return tracing.start_metrics_server(tracing.METRICS_PORT)
+
+@st.cache_resource
+def get_prediction_cache():
+    return PredictionCache(path=os.environ.get("CO2_PREDICTION_CACHE"))
+
+@st.cache_resource
+def get_report_builder():
+    return ReportBuilder()
+
+@st.cache_resource
+def get_suggestion_store():
+    return SuggestionStore()
+
+@st.cache_resource(max_entries=4)
+def get_fleet_analytics(source_id, model_name, _load_voyages):
+    return FleetAnalytics.from_voyages(_load_voyages(), get_model(model_name))
+
+@st.cache_data(max_entries=64)
+def surface_grid(model_name, distance_bounds, efficiency_bounds, emission_efficiency, resolution, cached=True):
+    model = get_model(model_name)
+    if cached:
+        prediction_cache = get_prediction_cache()
+        predict = lambda inputs: prediction_cache.predict(model_name, model, inputs)
+    else:
+        def predict(inputs):
+            with tracing.span("predict", rows=len(inputs), model=type(model).__name__, stage="surface"):
+                return model.predict(inputs)
+    dist_range = np.linspace(*distance_bounds, resolution)
+    eff_range = np.linspace(*efficiency_bounds, resolution)
+    return SurfaceGrid.from_meshgrid(*to_surface(scenario_sweep(model, dist_range, eff_range, emission_efficiency, predict=predict)))
+
+def show_surface(grid, grid_key, mode, **png_options):
+    with tracing.span("surface_render", page=page, mode=mode):
+        if mode == "Static image":
+            st.image(png_cache.get(grid_key, grid, **png_options))
+        elif go is not None:
+            st.plotly_chart(plotly_figure(grid))
+        else:
+            st.vega_lite_chart(spec=vega_lite_spec(grid), width="stretch")
+
+@st.fragment(run_every=0.5)
+def wait_for_report(report_key):
+    future = get_report_builder().get(report_key)
+    if future is None or future.done():
+        st.rerun()
+    st.info("⏳ Building your report in the background...")
+
+def report_download(report_key, label):
+    future = get_report_builder().get(report_key)
+    if future is None:
+        return
+    if not future.done():
+        wait_for_report(report_key)
+    elif future.exception() is not None:
+        st.error(f"⚠️ Could not build the report: {future.exception()}")
     else:
-        return load("optimized_xgboost_model.joblib")
+        st.download_button(
+            label=label,
+            data=future.result(),
+            file_name="Ship_Emission_Report.pdf",
+            mime="application/pdf"
+        )
+
+def run_upload(prefix, run_key, uploaded_file, stream, describe=None):
+    """Run `stream(on_chunk)` over the uploaded CSV once per `run_key`, with a progress bar.
+
+    The output file, summary and preview are kept in session_state under `prefix`.
+    """
+    if st.session_state.get(f"{prefix}_run_key") != run_key:
+        progress = st.progress(0.0, text="Predicting...")
+        running = st.empty()
+        preview = {}
+        def on_chunk(summary, chunk):
+            if not preview:
+                preview["df"] = chunk.head(PREVIEW_ROWS)
+            done = min(uploaded_file.tell() / max(uploaded_file.size, 1), 1.0)
+            progress.progress(done, text=f"Predicted {summary.rows:,} rows ({summary.chunks} chunks)")
+            if describe is not None:
+                running.markdown(describe(summary))
+        try:
+            output, summary = stream(on_chunk)
+        except ValueError as e:
+            st.error(f"⚠️ {e}")
+            st.stop()
+        progress.empty()
+        running.empty()
+        st.session_state[f"{prefix}_run_key"] = run_key
+        st.session_state[f"{prefix}_output"] = output
+        st.session_state[f"{prefix}_summary"] = summary
+        st.session_state[f"{prefix}_preview"] = preview.get("df", pd.DataFrame())
+    summary = st.session_state[f"{prefix}_summary"]
+    if summary.rows == 0:
+        st.warning("⚠️ The uploaded file has no data rows.")
+        st.stop()
+    return summary, st.session_state[f"{prefix}_preview"]
+
+def upload_download(prefix, label, file_name):
+    def read_output():
+        output = st.session_state[f"{prefix}_output"]
+        output.seek(0)
+        return output.read()
+    st.download_button(
+        label=label,
+        data=read_output,
+        file_name=file_name,
+        mime="text/csv"
+    )
 
 st.set_page_config(page_title="Ship Emission Predictor", page_icon="🌍", layout="wide")
 st.markdown("""
@@ -76,8 +202,15 @@ def flashcard_html(quotes, active_idx):
 st.markdown(flashcard_html(st.session_state.flashcard_state, st.session_state.active_idx), unsafe_allow_html=True)
 
 st.sidebar.title("🔧 Navigation")
-page = st.sidebar.radio("Go to", ["📊 Predict Emissions", "📁 Upload CSV", "📜 Policy Suggestions"])
+page = st.sidebar.radio("Go to", ["📊 Predict Emissions", "📁 Upload CSV", "📈 Fleet Analytics", "📜 Policy Suggestions"])
 model_choice = st.sidebar.selectbox("Choose Model", ["Random Forest", "XGBoost"])
+compare_models = st.sidebar.checkbox("Compare both models side by side")
+ensemble_weights = None
+if compare_models and st.sidebar.checkbox("Add weighted ensemble", value=True):
+    xgboost_weight = st.sidebar.slider("Ensemble weight on XGBoost", 0.0, 1.0, 0.5, step=0.05)
+    ensemble_weights = {"Random Forest": 1.0 - xgboost_weight, "XGBoost": xgboost_weight}
+grid_resolution = st.sidebar.slider("3D grid resolution", 10, 100, DEFAULT_RESOLUTION)
+chart_mode = st.sidebar.selectbox("3D chart", ["Interactive", "Static image"])
 
 if page == "📊 Predict Emissions":
     st.subheader("Enter Ship Parameters Manually")
@@ -88,11 +221,25 @@ if page == "📊 Predict Emissions":
     st.caption("📌 Emission efficiency is user-set (kg CO₂/litre) | Distance in km | Engine efficiency between 0.0 and 1.0")
     st.metric(label="Emission Efficiency", value=f"{emission_efficiency:.2f} kg CO₂/litre")
     features = np.array([[distance, engine_efficiency, emission_efficiency]])
+    current_inputs = (model_choice, distance, engine_efficiency, fuel_type, emission_efficiency, grid_resolution)
     if st.button("🌍 Predict Emission"):
+        st.session_state.predicted_inputs = current_inputs
+    if st.session_state.get("predicted_inputs") == current_inputs:
         model = get_model(model_choice)
-        result = model.predict(features)[0]
+        prediction_cache = get_prediction_cache()
+        def cached_predict(inputs):
+            return prediction_cache.predict(model_choice, model, inputs)
+        result = cached_predict(features)[0]
         trees_required = result / 21
         st.success(f"🌿 Predicted CO2 Emission: {result:.2f} kg")
+        if compare_models:
+            st.markdown("#### ⚖️ Model Comparison")
+            st.dataframe(get_model_comparison().frame(features, ensemble_weights).style.format("{:,.2f}"), hide_index=True)
+        interval_html = ""
+        if supports_intervals(model):
+            low, high = predict_distribution(model, features, quantiles=(0.05, 0.95)).iloc[0][[quantile_column(0.05), quantile_column(0.95)]]
+            st.caption(f"90% of the forest's trees predict between {low:,.2f} and {high:,.2f} kg.")
+            interval_html = f"<br>Across the forest's trees, 90% of estimates fall between <strong>{low / 21:.0f}</strong> and <strong>{high / 21:.0f} trees</strong>."
         st.markdown(f"""
 <div class="did-you-know-box" style="
     background-color: #f0fff0;
@@ -106,6 +253,7 @@ if page == "📊 Predict Emissions":
     🌳 <strong>Did you know?</strong><br><br>
     To absorb <strong>{result:.2f} kg</strong> of CO₂ emitted from this journey in one year,<br>
     we would need to plant approximately <strong>{trees_required:.0f} trees</strong> 🌱.
+    {interval_html}
     <br><br>
     Let’s strive for greener voyages and a cleaner planet! 🌍
 </div>
@@ -117,107 +265,29 @@ if page == "📊 Predict Emissions":
         }).sort_values(by="Importance", ascending=False).reset_index(drop=True)
         st.dataframe(feature_importances.style.bar(subset=['Importance'], color='#4CAF50'))
         st.markdown("### 📈 Trade-off Visualization Based on Your Input")
-        fig = plt.figure(figsize=(10, 6))
-        ax = fig.add_subplot(111, projection='3d')
-        dist_range = np.linspace(distance * 0.8, distance * 1.2, 30)
-        eff_range = np.linspace(max(0.1, engine_efficiency - 0.2), min(1.0, engine_efficiency + 0.2), 30)
-        dist_grid, eff_grid = np.meshgrid(dist_range, eff_range)
-        inputs = np.array([dist_grid.ravel(), eff_grid.ravel(), [emission_efficiency]*len(dist_grid.ravel())]).T
-        preds = model.predict(inputs).reshape(dist_grid.shape)
-        surf = ax.plot_surface(dist_grid, eff_grid, preds, cmap='viridis')
-        ax.set_title("3D Trade-off: Distance vs Efficiency vs Emissions")
-        ax.set_xlabel("Distance (km)")
-        ax.set_ylabel("Engine Efficiency")
-        ax.set_zlabel("Predicted CO2 Emission (kg)")
-        fig.colorbar(surf, shrink=0.5, aspect=10)
-        st.pyplot(fig)
+        grid_key = (model_choice, (distance * 0.8, distance * 1.2),
+                    (max(0.1, engine_efficiency - 0.2), min(1.0, engine_efficiency + 0.2)), emission_efficiency, grid_resolution)
+        grid = surface_grid(*grid_key)
+        show_surface(grid, grid_key, chart_mode)
         st.markdown("### 📄 Generate Final Report")
         st.markdown("### 📋 Personalize Your Report")
         uploaded_logo = st.file_uploader("Upload your logo for the report (optional)", type=["png", "jpg", "jpeg"])
         user_notes = st.text_area("Add custom notes to your report (optional)")
-        section_options = {
-            "Input Parameters": True,
-            "3D Emission Visualization": True,
-            "Feature Importance": st.checkbox("Include Feature Importance Table", value=True),
-            "Thank You Message": True
+        include_importance = st.checkbox("Include Feature Importance Table", value=True)
+        report_params = {
+            "inputs": {"distance": distance, "engine_efficiency": engine_efficiency, "fuel_type": fuel_type,
+                       "emission_efficiency": emission_efficiency, "result": float(result)},
+            "notes": user_notes,
+            "include_importance": include_importance,
+            "logo": uploaded_logo.getvalue() if uploaded_logo is not None else None,
         }
-        class PDF(FPDF):
-            def header(self):
-                if uploaded_logo is not None:
-                    logo_path = tempfile.NamedTemporaryFile(delete=False, suffix=".png").name
-                    uploaded_logo.seek(0)
-                    with open(logo_path, "wb") as f:
-                        f.write(uploaded_logo.read())
-                    self.image(logo_path, x=10, y=8, w=25)
-                self.set_fill_color(0, 119, 68)
-                self.rect(0, 0, 210, 18, 'F')
-                self.set_font("DejaVu", 'B', 18)
-                self.set_text_color(255,255,255)
-                self.cell(0, 12, "🌱 Ship CO2 Emission Prediction Report", ln=True, align="C")
-                self.ln(5)
-            def footer(self):
-                self.set_y(-15)
-                self.set_font("DejaVu", "", 10)
-                self.set_text_color(120,120,120)
-                self.cell(0, 10, f"Page {self.page_no()}  |  Powered by VNIT Nagpur", 0, 0, "C")
-        pdf = PDF()
-        pdf.add_font('DejaVu', '', 'DejaVuSans.ttf', uni=True)
-        pdf.add_font('DejaVu', 'B', 'DejaVuSans-Bold.ttf', uni=True)
-        pdf.add_page()
-        pdf.set_font("DejaVu", "", 10)
-        pdf.cell(0, 0, "")  # Dummy use to register font
-        if section_options["Input Parameters"]:
-            pdf.set_font("DejaVu", 'B', 14)
-            pdf.set_text_color(0,119,68)
-            pdf.cell(0, 10, "Input Parameters", ln=True)
-            pdf.set_text_color(0,0,0)
-            pdf.set_font("DejaVu", '', 12)
-            pdf.cell(0, 8, f"Distance: {distance} km", ln=True)
-            pdf.cell(0, 8, f"Engine Efficiency: {engine_efficiency:.2f}", ln=True)
-            pdf.cell(0, 8, f"Fuel Type: {fuel_type}", ln=True)
-            pdf.cell(0, 8, f"Emission Efficiency: {emission_efficiency:.2f} kg CO₂/litre", ln=True)
-            pdf.cell(0, 8, f"Predicted CO2 Emission: {result:.2f} kg", ln=True)
-            pdf.ln(5)
-        if user_notes:
-            pdf.set_font("DejaVu", 'B', 12)
-            pdf.set_text_color(0,119,68)
-            pdf.cell(0, 10, "Your Notes", ln=True)
-            pdf.set_font("DejaVu", '', 11)
-            pdf.set_text_color(0,0,0)
-            pdf.multi_cell(0, 8, user_notes)
-            pdf.ln(2)
-        if section_options["3D Emission Visualization"]:
-            pdf.set_font("DejaVu", 'B', 14)
-            pdf.set_text_color(0,119,68)
-            pdf.cell(0, 10, "3D Emission Prediction Visualization", ln=True)
-            tmp_graph = tempfile.NamedTemporaryFile(suffix='.png', delete=False)
-            fig.savefig(tmp_graph.name, bbox_inches='tight')
-            pdf.image(tmp_graph.name, x=10, w=190)
-            pdf.ln(5)
-        if section_options["Feature Importance"]:
-            pdf.set_font("DejaVu", 'B', 12)
-            pdf.set_text_color(0,119,68)
-            pdf.cell(0, 10, "Feature Importance (Random Forest)", ln=True)
-            pdf.set_font("DejaVu", '', 11)
-            pdf.set_text_color(0,0,0)
-            pdf.cell(0, 8, "distance: 0.9449", ln=True)
-            pdf.cell(0, 8, "emission_efficiency: 0.0309", ln=True)
-            pdf.cell(0, 8, "engine_efficiency: 0.0242", ln=True)
-            pdf.ln(3)
-        if section_options["Thank You Message"]:
-            pdf.set_fill_color(204,255,204)
-            pdf.set_text_color(0,119,68)
-            pdf.set_font("DejaVu", 'B', 12)
-            pdf.cell(0, 10, "Thank you for using Ship CO2 Emission Predictor!", ln=True, fill=True)
-        pdf_buffer = io.BytesIO()
-        pdf.output(pdf_buffer)
-        pdf_buffer.seek(0)
-        st.download_button(
-            label="📥 Download Personalized Report (PDF)",
-            data=pdf_buffer,
-            file_name="Ship_Emission_Report.pdf",
-            mime="application/pdf"
-        )
+        report_builder = get_report_builder()
+        report_key = report_builder.key_for("prediction", report_params, chart_key=grid_key)
+        if st.button("📄 Prepare PDF Report"):
+            report_builder.submit("prediction", report_params, chart=lambda: png_cache.get(grid_key, grid), chart_key=grid_key)
+            st.session_state.prediction_report = report_key
+        if st.session_state.get("prediction_report") == report_key:
+            report_download(report_key, "📥 Download Personalized Report (PDF)")
         share_url = "https://your-app-url.com"
         share_title = "Ship CO2 Emission Prediction"
         share_summary = f"I just predicted my ship's CO₂ emissions with this awesome app! Result: {result:.2f} kg CO₂. Try it yourself!"
@@ -238,13 +308,13 @@ if page == "📊 Predict Emissions":
         # --- Comparison Section ---
         st.markdown("### 🟩 Emission Comparison: Varying Engine Efficiency")
         st.write(f"**Distance fixed at:** `{distance}` km, **Emission Efficiency fixed at:** `{emission_efficiency:.2f}`")
-        comp_results = []
-        for eff in np.linspace(0.5, 1.0, 11):
-            test_feat = np.array([[distance, eff, emission_efficiency]])
-            pred = model.predict(test_feat)[0]
-            trees = pred / 21
-            comp_results.append({"Engine Efficiency": eff, "Predicted CO₂ Emission (kg)": pred, "Trees Needed": trees})
-        comp_df = pd.DataFrame(comp_results)
+        comp_effs = np.linspace(0.5, 1.0, 11)
+        comp_preds = scenario_sweep(model, distance, comp_effs, emission_efficiency, predict=cached_predict)[PREDICTION].to_numpy()
+        comp_df = pd.DataFrame({"Engine Efficiency": comp_effs, "Predicted CO₂ Emission (kg)": comp_preds, "Trees Needed": comp_preds / 21})
+        if supports_intervals(model):
+            comp_dist = scenario_distribution(model, distance, comp_effs, emission_efficiency, quantiles=(0.05, 0.95))
+            comp_df["Std (kg)"] = comp_dist[STD].to_numpy()
+            comp_df["90% Interval (kg)"] = [f"{lo:,.0f} – {hi:,.0f}" for lo, hi in comp_dist[[quantile_column(0.05), quantile_column(0.95)]].to_numpy()]
         st.dataframe(comp_df.style.background_gradient(subset=["Predicted CO₂ Emission (kg)"], cmap="Greens_r"))
         min_emission = comp_df["Predicted CO₂ Emission (kg)"].min()
         max_emission = comp_df["Predicted CO₂ Emission (kg)"].max()
@@ -266,6 +336,7 @@ if page == "📊 Predict Emissions":
 - **Regular Engine Maintenance:** Maintain engine and components for optimal performance and lower emissions.
 """)
         st.info("**Pro tip:** Combining slow steaming, route optimization, and regular maintenance can reduce fuel and emission by 15–30% per voyage!")
+        prediction_cache.save()
 
 elif page == "📁 Upload CSV":
     st.subheader("📤 Upload CSV for Emission Prediction")
@@ -279,87 +350,99 @@ elif page == "📁 Upload CSV":
         unsafe_allow_html=True
     )
     uploaded_file = st.file_uploader("Upload a CSV file with appropriate features", type=["csv"])
-    if uploaded_file is not None:
-        df = pd.read_csv(uploaded_file)
-        st.write("📄 Uploaded Data Preview:")
+    chunksize = st.number_input("Rows per chunk", min_value=1000, max_value=1_000_000, value=DEFAULT_CHUNKSIZE, step=10_000)
+    if uploaded_file is not None and compare_models:
+        comparison = get_model_comparison()
+        run_key = (uploaded_file.file_id, chunksize, None if ensemble_weights is None else tuple(ensemble_weights.items()))
+        summary, df = run_upload("compare", run_key, uploaded_file, lambda on_chunk: compare_csv_stream(
+            comparison, uploaded_file, chunksize=chunksize, weights=ensemble_weights, on_chunk=on_chunk))
+        st.success("✅ Emissions predicted with every model!")
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Rows", f"{summary.rows:,}")
+        col2.metric("Mean disagreement (kg)", f"{summary.mean_disagreement:,.2f}")
+        col3.metric("Max disagreement (kg)", f"{summary.disagreement_max:,.2f}")
+        metrics = summary.metrics().rename(columns={"total_kg": "Total (kg)", "mean_kg": "Mean (kg)", "rmse": "RMSE (kg)",
+                                                    "mae": "MAE (kg)", "bias": "Bias (kg)", "r2": "R²"})
+        st.dataframe(metrics.style.format("{:,.2f}").format("{:.4f}", subset=[c for c in ["R²"] if c in metrics]))
+        if summary.scored:
+            st.caption(f"Errors are over the {summary.scored:,} rows with a value in `{summary.actual_column}`; bias is mean predicted minus actual.")
+        else:
+            st.info("Include a `CO2_emissions` column to also see each model's error against actual emissions.")
+        st.write(f"📄 Preview of the first {PREVIEW_ROWS} compared rows:")
         st.dataframe(df)
+        st.line_chart(df[[prediction_column(name) for name in summary.names]])
+        st.write("🔎 Rows where the models disagree most:")
+        st.dataframe(summary.top)
+        upload_download("compare", "📩 Download CSV with Compared Predictions", "compared_emissions.csv")
+    elif uploaded_file is not None:
         model = get_model(model_choice)
-        predictions = model.predict(df)
-        df["Predicted CO2 Emission (kg)"] = predictions
+        intervals = supports_intervals(model) and st.checkbox(
+            "Add prediction intervals (std and 5/50/95th percentiles across the forest's trees)")
+        run_key = (uploaded_file.file_id, model_choice, chunksize, intervals)
+        summary, df = run_upload(
+            "batch", run_key, uploaded_file,
+            lambda on_chunk: predict_csv_stream(model, uploaded_file, chunksize=chunksize, on_chunk=on_chunk, intervals=intervals),
+            describe=lambda summary: f"Running mean: **{summary.mean:.2f} kg** | Total: **{summary.total:,.0f} kg**")
         st.success("✅ Emissions predicted for uploaded data!")
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Rows", f"{summary.rows:,}")
+        col2.metric("Total CO2 (kg)", f"{summary.total:,.0f}")
+        col3.metric("Mean CO2 (kg)", f"{summary.mean:,.2f}")
+        col4.metric("Min / Max (kg)", f"{summary.min:,.0f} / {summary.max:,.0f}")
+        st.write(f"📄 Preview of the first {PREVIEW_ROWS} predicted rows:")
         st.dataframe(df)
-        st.bar_chart(df["Predicted CO2 Emission (kg)"])
-        fig = plt.figure(figsize=(8, 5))
-        ax = fig.add_subplot(111, projection='3d')
-        dist_range = np.linspace(df['distance'].min(), df['distance'].max(), 30)
-        eff_range = np.linspace(df['engine efficiency'].min(), df['engine efficiency'].max(), 30)
-        dist_grid, eff_grid = np.meshgrid(dist_range, eff_range)
-        emission_eff = df['emission efficiency'].mean()
-        inputs = np.array([dist_grid.ravel(), eff_grid.ravel(), [emission_eff]*len(dist_grid.ravel())]).T
-        preds = model.predict(inputs).reshape(dist_grid.shape)
-        surf = ax.plot_surface(dist_grid, eff_grid, preds, cmap='viridis')
-        ax.set_title("3D Trade-off: Distance vs Efficiency vs Emissions")
-        ax.set_xlabel("Distance (km)")
-        ax.set_ylabel("Engine Efficiency")
-        ax.set_zlabel("Predicted CO2 Emission (kg)")
-        plt.tight_layout()
-        st.pyplot(fig)
-        class PDF(FPDF):
-            def header(self):
-                self.set_fill_color(0, 119, 68)
-                self.rect(0, 0, 210, 18, 'F')
-                self.set_font("DejaVu", 'B', 18)
-                self.set_text_color(255,255,255)
-                self.cell(0, 12, "🌱 Ship CO2 Emission Prediction Report", ln=True, align="C")
-                self.ln(5)
-            def footer(self):
-                self.set_y(-15)
-                self.set_font("DejaVu", "", 10)
-                self.set_text_color(120,120,120)
-                self.cell(0, 10, f"Page {self.page_no()}  |  Powered by VNIT Nagpur", 0, 0, "C")
-        pdf = PDF()
-        pdf.add_font('DejaVu', '', 'DejaVuSans.ttf', uni=True)
-        pdf.add_font('DejaVu', 'B', 'DejaVuSans-Bold.ttf', uni=True)
-        pdf.add_page()
-        pdf.set_font("DejaVu", 'B', 14)
-        pdf.set_text_color(0,119,68)
-        pdf.cell(0, 10, "Summary of Uploaded Data", ln=True)
-        pdf.set_text_color(0,0,0)
-        pdf.set_font("DejaVu", '', 11)
-        for col in df.columns:
-            pdf.cell(0, 8, f"{col}: {df[col].iloc[0]}", ln=True)
-        pdf.ln(3)
-        pdf.set_font("DejaVu", 'B', 12)
-        pdf.set_text_color(0,119,68)
-        pdf.cell(0, 10, "3D Emission Prediction Visualization", ln=True)
-        tmp_graph = tempfile.NamedTemporaryFile(suffix='.png', delete=False)
-        plt.savefig(tmp_graph.name, bbox_inches='tight')
-        pdf.image(tmp_graph.name, x=10, w=190)
-        pdf.ln(5)
-        pdf.set_font("DejaVu", '', 11)
-        pdf.set_text_color(0,0,0)
-        pdf.multi_cell(0, 8, "This report provides a professional summary of your uploaded ship data and the predicted CO2 emissions, including a 3D visualization of the relationship between distance, engine efficiency, and emission efficiency. For more details, visit our website or contact the VNIT Nagpur team.")
-        pdf.ln(5)
-        pdf.set_fill_color(204,255,204)
-        pdf.set_text_color(0,119,68)
-        pdf.set_font("DejaVu", 'B', 12)
-        pdf.cell(0, 10, "Thank you for using Ship CO2 Emission Predictor!", ln=True, fill=True)
-        pdf_buffer = io.BytesIO()
-        pdf.output(pdf_buffer)
-        pdf_buffer.seek(0)
-        st.download_button(
-            label="📥 Download Professional Report (PDF)",
-            data=pdf_buffer,
-            file_name="Ship_Emission_Report.pdf",
-            mime="application/pdf"
-        )
-        csv = df.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label="📩 Download CSV with Predictions",
-            data=csv,
-            file_name="predicted_emissions.csv",
-            mime="text/csv"
-        )
+        st.bar_chart(df[PREDICTION_COLUMN])
+        interval_columns = [INTERVAL_COLUMNS[quantile_column(q)] for q in (0.05, 0.95)]
+        if set(interval_columns).issubset(df.columns):
+            st.write("90% interval across the forest's trees for the previewed rows:")
+            st.line_chart(df[[interval_columns[0], PREDICTION_COLUMN, interval_columns[1]]])
+        batch_png = {"figsize": (8, 5), "colorbar": False}
+        grid_key = chart = None
+        if summary.has_feature_ranges:
+            # Uploaded features may be on any scale, so this grid bypasses the quantized prediction cache.
+            grid_key = (model_choice, (summary.feature_min['distance'], summary.feature_max['distance']),
+                        (summary.feature_min['engine efficiency'], summary.feature_max['engine efficiency']),
+                        summary.feature_mean('emission efficiency'), grid_resolution, False)
+            grid = surface_grid(*grid_key)
+            show_surface(grid, grid_key, chart_mode, **batch_png)
+            chart = lambda: png_cache.get(grid_key, grid, **batch_png)
+        else:
+            st.info("A feature column has no values, so there is no trade-off surface for this file.")
+        report_params = {"first_row": summary.first_row, "rows": summary.rows, "total": summary.total}
+        report_builder = get_report_builder()
+        report_key = report_builder.key_for("batch", report_params, chart_key=grid_key)
+        if st.button("📄 Prepare PDF Report"):
+            report_builder.submit("batch", report_params, chart=chart, chart_key=grid_key)
+            st.session_state.batch_report = report_key
+        if st.session_state.get("batch_report") == report_key:
+            report_download(report_key, "📥 Download Professional Report (PDF)")
+        upload_download("batch", "📩 Download CSV with Predictions", "predicted_emissions.csv")
+
+elif page == "📈 Fleet Analytics":
+    st.subheader("📈 Fleet Emission Analytics")
+    voyage_file = st.file_uploader("Upload voyage records (defaults to the bundled fleet data)", type=["csv"])
+    if voyage_file is not None:
+        source_id, load_voyages = voyage_file.file_id, lambda: pd.read_csv(voyage_file)
+    else:
+        source_id, load_voyages = "bundled", load_bundled_voyages
+    try:
+        fleet = get_fleet_analytics(source_id, model_choice, load_voyages)
+    except ValueError as e:
+        st.error(f"⚠️ {e}")
+        st.stop()
+    measure = st.selectbox("Emissions", fleet.measures)
+    st.caption(f"{fleet.voyages:,} voyages | Predicted values use the {model_choice} model")
+    tabs = st.tabs(list(DIMENSIONS))
+    for tab, (label, column) in zip(tabs, DIMENSIONS.items()):
+        with tab:
+            totals = fleet.totals(measure, column)
+            keys = st.multiselect(label, list(totals.index), default=list(totals.index[:5]), key=f"fleet_{column}")
+            st.line_chart(fleet.monthly(measure, column, keys))
+            st.dataframe(totals.loc[keys] if keys else totals)
+            if column != "weather_conditions":
+                weather = fleet.weather_breakdown(measure, column)
+                st.write(f"Mean CO2 per voyage (kg) by weather and {label.lower()}:")
+                st.dataframe(weather.loc[keys] if keys else weather)
 
 elif page == "📜 Policy Suggestions":
     st.subheader("📜 Suggest Eco-Friendly Maritime Policies")
@@ -372,14 +455,70 @@ elif page == "📜 Policy Suggestions":
     """)
     suggestion = st.text_area("💡 Enter your policy suggestion:", max_chars=500)
     name = st.text_input("✍️ Your Name (Optional):")
+    store = get_suggestion_store()
     if st.button("📤 Submit Suggestion"):
-        if suggestion.strip():
-            st.success("✅ Thank you for your valuable input! Your idea has been recorded.")
-        else:
+        try:
+            stored = store.submit(suggestion, name)
+        except ValueError:
             st.warning("⚠️ Suggestion cannot be empty.")
+        else:
+            if stored["duplicate"]:
+                st.info(f"👍 A very similar idea was already suggested; we've added your voice to it ({stored['votes']} so far).")
+            else:
+                st.success("✅ Thank you for your valuable input! Your idea has been recorded.")
+    st.markdown("### 🗂️ Browse Suggestions")
+    col1, col2 = st.columns([3, 1])
+    search = col1.text_input("🔎 Search suggestions")
+    order = col2.selectbox("Sort by", ["newest", "most_submitted"], format_func=lambda o: o.replace("_", " ").capitalize())
+    # Keyset cursors of the pages visited so far; starting over whenever the search or sort changes.
+    if st.session_state.get("suggestion_view") != (search, order):
+        st.session_state.suggestion_view = (search, order)
+        st.session_state.suggestion_cursors = [None]
+    cursors = st.session_state.suggestion_cursors
+    rows, next_cursor = store.page(search, order, after=cursors[-1])
+    if rows:
+        st.dataframe(pd.DataFrame({
+            "Suggestion": [r["text"] for r in rows],
+            "By": [r["name"] or "Anonymous" for r in rows],
+            "Submitted": [r["votes"] for r in rows],
+            "First submitted": pd.to_datetime([r["created_at"] for r in rows], unit="s").strftime("%Y-%m-%d %H:%M"),
+        }), hide_index=True)
+    else:
+        st.write("No suggestions found.")
+    col1, col2, col3 = st.columns([1, 2, 1])
+    if col1.button("⬅️ Previous", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    col2.caption(f"Page {len(cursors)} | {PAGE_SIZE} per page | {store.count():,} suggestions in total")
+    if col3.button("Next ➡️", disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun()
     st.markdown("---")
     st.markdown("🌍 Every idea counts. Together, we can build a greener maritime future.")
 
+# --- Prediction cache stats ---
+cache_stats = get_prediction_cache().stats()
+with st.sidebar.expander("⚡ Prediction Cache"):
+    st.write(f"Entries: {cache_stats['entries']:,}")
+    st.write(f"Hits: {cache_stats['hits']:,} | Misses: {cache_stats['misses']:,}")
+    st.write(f"Evictions: {cache_stats['evictions']:,}")
+    st.write(f"Hit rate: {cache_stats['hit_rate']:.1%}")
+
+# --- Performance ---
+if tracing.tracer.enabled:
+    if tracing.METRICS_PORT:
+        get_metrics_server()
+    with st.sidebar.expander("⏱️ Performance"):
+        if "last_rerun_ms" in st.session_state:
+            st.write(f"Last rerun: {st.session_state.last_rerun_ms:,.0f} ms")
+        counters = {(c["counter"], c["labels"]): c["value"] for c in tracing.tracer.counter_snapshot()}
+        for (name, labels), calls in counters.items():
+            if name == "get_model":
+                st.write(f"get_model misses ({labels}): {counters.get(('get_model_miss', labels), 0)} / {calls}")
+        spans = tracing.tracer.snapshot()
+        if spans:
+            st.dataframe(pd.DataFrame(spans).round(2), hide_index=True)
+
 # --- Footer ---
 st.markdown("""
     <hr style="margin-top:40px; margin-bottom:10px; border: none; border-top: 2px solid #007744;">
@@ -387,3 +526,7 @@ st.markdown("""
         VNIT Nagpur × IIT Kharagpur
     </div>
 """, unsafe_allow_html=True)
+
+rerun_s = time.perf_counter() - rerun_start
+tracing.observe("rerun", rerun_s, page=page)
+st.session_state.last_rerun_ms = rerun_s * 1000
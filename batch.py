@@ -0,0 +1,171 @@
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import tracing
+from uncertainty import DEFAULT_QUANTILES, MEAN, STD, predict_distribution, quantile_column
+
+FEATURE_COLUMNS = ["distance", "engine efficiency", "emission efficiency"]
+PREDICTION_COLUMN = "Predicted CO2 Emission (kg)"
+DEFAULT_CHUNKSIZE = 100_000
+SPOOL_MAX_SIZE = 32 * 1024 * 1024
+# Output columns added by `intervals=True`, keyed by predict_distribution's columns.
+INTERVAL_COLUMNS = {STD: "Prediction Std (kg)"}
+INTERVAL_COLUMNS.update((quantile_column(q), f"Prediction P{q * 100:g} (kg)") for q in DEFAULT_QUANTILES)
+
+
+class BatchSummary:
+    """Running aggregates over a streamed prediction run, updated one chunk at a time.
+
+    Blank feature cells are skipped like pandas does: per-feature aggregates
+    cover the non-missing values only, and `feature_count` says how many there were.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.chunks = 0
+        self.total = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.feature_min = {c: np.inf for c in FEATURE_COLUMNS}
+        self.feature_max = {c: -np.inf for c in FEATURE_COLUMNS}
+        self.feature_sum = {c: 0.0 for c in FEATURE_COLUMNS}
+        self.feature_count = {c: 0 for c in FEATURE_COLUMNS}
+        self.first_row = None
+
+    def update(self, features, predictions, chunk):
+        if len(predictions) == 0:
+            return
+        if self.first_row is None:
+            self.first_row = chunk.iloc[0].to_dict()
+        self.rows += len(predictions)
+        self.chunks += 1
+        self.total += float(predictions.sum(dtype=np.float64))
+        self.min = min(self.min, float(predictions.min()))
+        self.max = max(self.max, float(predictions.max()))
+        for i, col in enumerate(FEATURE_COLUMNS):
+            values = features[:, i]
+            count = len(values) - int(np.count_nonzero(np.isnan(values)))
+            if count == 0:
+                continue
+            self.feature_min[col] = min(self.feature_min[col], float(np.nanmin(values)))
+            self.feature_max[col] = max(self.feature_max[col], float(np.nanmax(values)))
+            self.feature_sum[col] += float(np.nansum(values, dtype=np.float64))
+            self.feature_count[col] += count
+
+    @property
+    def mean(self):
+        return self.total / self.rows if self.rows else float("nan")
+
+    @property
+    def has_feature_ranges(self):
+        """Whether every feature column had at least one value."""
+        return all(self.feature_count.values())
+
+    def feature_mean(self, col):
+        return self.feature_sum[col] / self.feature_count[col] if self.feature_count[col] else float("nan")
+
+
+def _normalize(name):
+    return name.strip().lower().replace("_", " ")
+
+
+def match_column(header, name):
+    """The column of `header` matching `name` in the same loose way, or None."""
+    return {_normalize(c): c for c in header}.get(_normalize(name))
+
+
+def match_feature_columns(header):
+    """Map FEATURE_COLUMNS onto `header`, accepting any case and `_` for spaces."""
+    lookup = {_normalize(c): c for c in header}
+    missing = [c for c in FEATURE_COLUMNS if c not in lookup]
+    if missing:
+        raise ValueError(f"CSV is missing required columns: {', '.join(missing)}")
+    return [lookup[c] for c in FEATURE_COLUMNS]
+
+
+def iter_feature_chunks(source, chunksize=DEFAULT_CHUNKSIZE, optional_columns=()):
+    """Yield (features, chunk) for the CSV in `source`, read `chunksize` rows at a time.
+
+    Feature columns are matched with match_feature_columns, read as float32 and
+    renamed to FEATURE_COLUMNS; `features` is their contiguous matrix. Any of
+    `optional_columns` found in the header (matched the same way) is read as
+    float64 and renamed to that name. A header-only CSV yields nothing.
+    """
+    header = pd.read_csv(source, nrows=0).columns
+    source.seek(0)
+    renames = dict(zip(match_feature_columns(header), FEATURE_COLUMNS))
+    dtype = {c: np.float32 for c in renames}
+    for name in optional_columns:
+        column = match_column(header, name)
+        if column is not None and column not in renames:
+            renames[column] = name
+            dtype[column] = np.float64
+    for chunk in pd.read_csv(source, chunksize=chunksize, dtype=dtype):
+        # A header-only CSV still yields one empty chunk, which the models refuse to predict.
+        if chunk.empty:
+            continue
+        chunk = chunk.rename(columns=renames)
+        yield np.ascontiguousarray(chunk[FEATURE_COLUMNS].to_numpy(dtype=np.float32)), chunk
+
+
+def iter_prediction_chunks(model, source, chunksize=DEFAULT_CHUNKSIZE, intervals=False):
+    """Yield (features, predictions, chunk) for `source` read `chunksize` rows at a time.
+
+    With `intervals` (Random Forest only) each chunk also gets INTERVAL_COLUMNS
+    from the spread of the per-tree predictions.
+    """
+    for features, chunk in iter_feature_chunks(source, chunksize):
+        if intervals:
+            distribution = predict_distribution(model, features)
+            predictions = distribution[MEAN].to_numpy()
+        else:
+            with tracing.span("predict", rows=len(features), model=type(model).__name__, stage="batch"):
+                predictions = model.predict(features)
+        chunk[PREDICTION_COLUMN] = predictions
+        if intervals:
+            for column, name in INTERVAL_COLUMNS.items():
+                chunk[name] = distribution[column].to_numpy()
+        yield features, predictions, chunk
+
+
+def predict_frame(model, frame, chunksize=DEFAULT_CHUNKSIZE):
+    """Predict an in-memory frame `chunksize` rows at a time, returning a float64 array."""
+    matrix = np.ascontiguousarray(frame[match_feature_columns(frame.columns)].to_numpy(dtype=np.float32))
+    predictions = np.empty(len(frame), dtype=np.float64)
+    for start in range(0, len(frame), chunksize):
+        features = matrix[start:start + chunksize]
+        with tracing.span("predict", rows=len(features), model=type(model).__name__, stage="batch"):
+            predictions[start:start + len(features)] = model.predict(features)
+    return predictions
+
+
+def write_csv_stream(results, summary, on_chunk=None, out=None):
+    """Write the chunk of every (features, predictions, chunk) in `results` to `out` as one CSV.
+
+    `out` is a binary file, by default a spooled temporary file (in memory up to
+    SPOOL_MAX_SIZE, on disk beyond it). `summary.update(features, predictions,
+    chunk)` and then `on_chunk(summary, chunk)` are called after each chunk is
+    written. Returns `out` rewound, and `summary`.
+    """
+    if out is None:
+        out = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode="w+b")
+    header = True
+    for features, predictions, chunk in results:
+        out.write(chunk.to_csv(index=False, header=header).encode("utf-8"))
+        header = False
+        summary.update(features, predictions, chunk)
+        if on_chunk is not None:
+            on_chunk(summary, chunk)
+    out.seek(0)
+    return out, summary
+
+
+def predict_csv_stream(model, source, chunksize=DEFAULT_CHUNKSIZE, on_chunk=None, out=None, intervals=False):
+    """Predict every row of the CSV in `source` without holding the whole table in memory.
+
+    Predictions are written by write_csv_stream, which returns the output file
+    rewound together with a BatchSummary.
+    """
+    return write_csv_stream(iter_prediction_chunks(model, source, chunksize, intervals), BatchSummary(), on_chunk, out)
@@ -0,0 +1,94 @@
+"""Compare cold-start load time and resident memory of each model artifact format.
+
+Every measurement runs in a fresh interpreter so that imports and page cache
+effects of one format do not leak into the next:
+
+    python benchmarks/load_formats.py [--repeat 5] [--json results.json]
+
+The joblib artifacts are copied into a temporary directory and flattened
+there, so running the benchmark never adds `.flat/` exports to the repo.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FORMATS = [
+    ("joblib", None),
+    ("joblib", "r"),
+    ("flat", None),
+    ("flat", "r"),
+]
+
+_PROBE = r"""
+import json, os, sys, time
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+sys.path.insert(0, {root!r})
+import numpy
+before = rss_mb()
+start = time.perf_counter()
+from registry import ModelRegistry
+model = ModelRegistry({models_root!r}).load({name!r}, format={format!r}, mmap_mode={mmap_mode!r})
+model.predict(numpy.zeros((1, 3), dtype=numpy.float32))
+elapsed = time.perf_counter() - start
+print(json.dumps({{"load_s": elapsed, "rss_mb": rss_mb() - before}}))
+"""
+
+
+def probe(models_root, name, format, mmap_mode):
+    code = _PROBE.format(root=ROOT, models_root=models_root, name=name, format=format, mmap_mode=mmap_mode)
+    out = subprocess.run([sys.executable, "-W", "ignore", "-c", code], check=True, capture_output=True, text=True, cwd=ROOT)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure(models_root, name, format, mmap_mode, repeat):
+    runs = [probe(models_root, name, format, mmap_mode) for _ in range(repeat)]
+    result = {
+        "model": name,
+        "format": format,
+        "mmap_mode": mmap_mode,
+        "load_s_median": statistics.median(r["load_s"] for r in runs),
+        "rss_mb_median": statistics.median(r["rss_mb"] for r in runs),
+    }
+    print(f"{name:35s} {format:6s} mmap={str(mmap_mode):4s} "
+          f"load {result['load_s_median'] * 1000:8.1f} ms   +RSS {result['rss_mb_median']:7.1f} MB")
+    return result
+
+
+def main(argv=None):
+    from registry import ModelRegistry
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="co2-formats-") as models_root:
+        for entry in ModelRegistry().entries.values():
+            if entry.joblib_path:
+                shutil.copy2(entry.joblib_path, models_root)
+        registry = ModelRegistry(models_root)
+        for name in registry.names():
+            registry.export_flat(name)
+        results = [measure(models_root, name, format, mmap_mode, args.repeat)
+                   for name in registry.names() for format, mmap_mode in FORMATS]
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""Headless benchmarks of the app's hot paths: model loading, prediction, plotting and PDF reports.
+
+Rows are drawn from the bundled cleaned_featured_data.csv and tiled up to each
+batch size. Results are printed and written as JSON so runs from different
+versions can be compared:
+
+    python benchmarks/suite.py [--quick] [--models rf xgb] [--json results.json]
+    python benchmarks/suite.py --baseline old.json --tolerance 0.25   # exit 1 on regressions
+
+Latencies are wall-clock (perf_counter); peak memory is the tracemalloc peak of
+one extra, separately traced run, so tracing never skews the timings.
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import matplotlib
+
+matplotlib.use("Agg")
+import numpy as np
+import pandas as pd
+
+from features import FEATURED_DATA, NORMALIZED_COLUMNS
+
+BATCH_SIZES = [1, 10, 100, 1_000, 10_000, 100_000, 1_000_000]
+QUICK_BATCH_SIZES = [1, 100, 10_000]
+SINGLE_ROW_REPEAT = 200
+# Stop repeating a case once it has used this many seconds (after at least MIN_REPEAT runs).
+TIME_BUDGET_S = 2.0
+MIN_REPEAT = 3
+CSV_ROWS = 100_000
+PERCENTILES = (50, 90, 99)
+
+
+def load_rows():
+    frame = pd.read_csv(os.path.join(ROOT, FEATURED_DATA), usecols=NORMALIZED_COLUMNS)
+    return np.ascontiguousarray(frame[NORMALIZED_COLUMNS].to_numpy(dtype=np.float32))
+
+
+def tile_rows(rows, n):
+    return np.ascontiguousarray(np.resize(rows, (n, rows.shape[1])))
+
+
+def time_calls(fn, repeat, budget_s=TIME_BUDGET_S, warmup=1):
+    for _ in range(warmup):
+        fn()
+    times = []
+    spent = 0.0
+    while len(times) < repeat and (len(times) < MIN_REPEAT or spent < budget_s):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        times.append(elapsed)
+        spent += elapsed
+    return np.array(times)
+
+
+def peak_memory_mb(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def summarize(times, rows=None):
+    ms = times * 1000
+    stats = {"runs": len(times), "mean_ms": float(ms.mean()), "min_ms": float(ms.min()), "max_ms": float(ms.max())}
+    for p in PERCENTILES:
+        stats[f"p{p}_ms"] = float(np.percentile(ms, p))
+    if rows is not None:
+        stats["rows"] = rows
+        stats["rows_per_s"] = float(rows / np.median(times))
+    return stats
+
+
+class Suite:
+    def __init__(self, repeat, budget_s, memory=True):
+        self.repeat = repeat
+        self.budget_s = budget_s
+        self.memory = memory
+        self.results = []
+
+    def run(self, group, name, fn, rows=None, repeat=None, warmup=1, **params):
+        stats = summarize(time_calls(fn, repeat or self.repeat, self.budget_s, warmup), rows)
+        if self.memory:
+            stats["peak_mb"] = peak_memory_mb(fn)
+        result = {"group": group, "name": name, "params": params, **stats}
+        self.results.append(result)
+        label = " ".join(f"{k}={v}" for k, v in params.items())
+        line = f"{group:8s} {name:22s} {label:34s} p50 {stats['p50_ms']:10.3f} ms  p99 {stats['p99_ms']:10.3f} ms"
+        if rows is not None:
+            line += f"  {stats['rows_per_s']:14,.0f} rows/s"
+        if "peak_mb" in stats:
+            line += f"  peak {stats['peak_mb']:8.1f} MB"
+        print(line, flush=True)
+        return result
+
+
+def bench_models(suite, model_names, batch_sizes, rows):
+    import inference
+    from registry import ModelRegistry
+    from uncertainty import predict_distribution, supports_intervals
+
+    for model_name in model_names:
+        display = inference.resolve_model_name(model_name)
+        artifact = os.path.splitext(inference.MODEL_FILES[display])[0]
+        fmt = inference.MODEL_FORMAT or "joblib"
+        # A fresh registry per call bypasses its cache, as on the first get_model() of a session. The
+        # first load also pays for importing the model's library; load_formats.py measures fully cold processes.
+        load = lambda: ModelRegistry().load(artifact, format=inference.MODEL_FORMAT, mmap_mode=inference.MMAP_MODE)
+        suite.run("load", "model_load_first", load, repeat=1, warmup=0, model=display, format=fmt)
+        suite.run("load", "model_load", load, repeat=MIN_REPEAT, model=display, format=fmt)
+        model = inference.load_model(display)
+        single = rows[:1]
+        suite.run("predict", "single_row", lambda: model.predict(single), rows=1,
+                  repeat=SINGLE_ROW_REPEAT, model=display)
+        for size in batch_sizes:
+            batch = tile_rows(rows, size)
+            suite.run("predict", "batch", lambda: model.predict(batch), rows=size, model=display, batch_size=size)
+            if supports_intervals(model):
+                suite.run("predict", "distribution", lambda: predict_distribution(model, batch), rows=size,
+                          model=display, batch_size=size)
+
+
+def bench_comparison(suite, model_names, batch_sizes, rows):
+    import inference
+    from ensemble import ModelComparison
+
+    models = {name: inference.load_model(name) for name in dict.fromkeys(map(inference.resolve_model_name, model_names))}
+    if len(models) < 2:
+        return
+    comparison = ModelComparison(models)
+    for size in batch_sizes:
+        batch = tile_rows(rows, size)
+        suite.run("compare", "sequential", lambda: [m.predict(batch) for m in models.values()], rows=size, batch_size=size)
+        suite.run("compare", "concurrent", lambda: comparison.predict(batch), rows=size, batch_size=size)
+    comparison.close()
+
+
+def bench_sweeps(suite, model_name, rows):
+    import inference
+    from prediction_cache import PredictionCache
+    from sweep import DEFAULT_RESOLUTION, scenario_sweep, to_surface
+
+    model = inference.load_model(model_name)
+    lo, hi = rows.min(axis=0), rows.max(axis=0)
+    axis = np.linspace(lo[0], hi[0], DEFAULT_RESOLUTION)
+    eff_axis = np.linspace(lo[1], hi[1], DEFAULT_RESOLUTION)
+    emission = np.linspace(lo[2], hi[2], 11)
+    suite.run("sweep", "comparison_11", lambda: scenario_sweep(model, rows[0, 0], rows[0, 1], emission),
+              rows=11, model=model_name)
+    suite.run("sweep", "surface_grid", lambda: to_surface(scenario_sweep(model, axis, eff_axis, rows[0, 2])),
+              rows=DEFAULT_RESOLUTION**2, model=model_name, resolution=DEFAULT_RESOLUTION)
+    cache = PredictionCache()
+    cached = lambda X: cache.predict(model_name, model, X)
+    suite.run("sweep", "surface_grid_cached", lambda: scenario_sweep(model, axis, eff_axis, rows[0, 2], predict=cached),
+              rows=DEFAULT_RESOLUTION**2, model=model_name, resolution=DEFAULT_RESOLUTION)
+
+
+def surface_grid(resolution=30):
+    from surface import SurfaceGrid
+
+    x, y = np.linspace(100, 20000, resolution), np.linspace(0, 1, resolution)
+    return SurfaceGrid(x, y, x[None, :] * (1.2 - y[:, None]))
+
+
+def bench_reporting(suite, rows):
+    import report
+    import inference
+    from batch import FEATURE_COLUMNS, predict_csv_stream
+
+    from surface import plotly_figure, render_png, go
+
+    for resolution in (30, 100):
+        grid = surface_grid(resolution)
+        suite.run("figure", "surface_png", lambda: render_png(grid), resolution=resolution)
+        if go is not None:
+            suite.run("figure", "surface_plotly_json", lambda: plotly_figure(grid).to_json(), resolution=resolution)
+    chart = render_png(surface_grid(30))
+    inputs = {"distance": 5000, "engine_efficiency": 0.85, "fuel_type": "HFO", "emission_efficiency": 3.0, "result": 12345.6}
+    # The first document pays for subsetting the fonts; later ones reuse the subsets.
+    suite.run("report", "prediction_pdf_cold", lambda: report.build_prediction_report(inputs, chart),
+              repeat=1, warmup=0)
+    suite.run("report", "prediction_pdf", lambda: report.build_prediction_report(inputs, chart))
+    first_row = {"distance": 0.5, "engine efficiency": 0.5, "emission efficiency": 0.5}
+    suite.run("report", "batch_pdf", lambda: report.build_batch_report(first_row, 1000, 1.0e7, chart))
+
+    frame = pd.DataFrame(tile_rows(rows, CSV_ROWS), columns=FEATURE_COLUMNS)
+    data = frame.to_csv(index=False).encode()
+    model = inference.load_model("Random Forest")
+    suite.run("csv", "to_csv", lambda: frame.to_csv(index=False), rows=CSV_ROWS)
+    suite.run("csv", "predict_csv_stream", lambda: predict_csv_stream(model, io.BytesIO(data))[0].close(),
+              rows=CSV_ROWS, model="Random Forest")
+
+
+def metadata():
+    import sklearn
+    import xgboost
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scikit-learn": sklearn.__version__,
+        "xgboost": xgboost.__version__,
+        "matplotlib": matplotlib.__version__,
+    }
+
+
+def _key(result):
+    return (result["group"], result["name"], json.dumps(result["params"], sort_keys=True))
+
+
+def compare(results, baseline, tolerance):
+    """Cases whose median latency grew by more than `tolerance` (a fraction) over `baseline`."""
+    previous = {_key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get(_key(result))
+        if old is None or old["p50_ms"] <= 0:
+            continue
+        ratio = result["p50_ms"] / old["p50_ms"]
+        if ratio > 1 + tolerance:
+            regressions.append({"group": result["group"], "name": result["name"], "params": result["params"],
+                                "baseline_p50_ms": old["p50_ms"], "p50_ms": result["p50_ms"], "ratio": ratio})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", nargs="+", default=["Random Forest", "XGBoost"])
+    parser.add_argument("--batch-sizes", nargs="+", type=int, help=f"Default: {BATCH_SIZES}.")
+    parser.add_argument("--repeat", type=int, default=20, help="Maximum timed runs per case.")
+    parser.add_argument("--budget", type=float, default=TIME_BUDGET_S, help="Seconds per case before repeats stop.")
+    parser.add_argument("--quick", action="store_true", help=f"Batch sizes {QUICK_BATCH_SIZES} and a shorter budget.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the traced peak-memory runs.")
+    parser.add_argument("--only", nargs="+", choices=["models", "sweeps", "reporting"])
+    parser.add_argument("--json", help="Write the results to this file.")
+    parser.add_argument("--baseline", help="Earlier --json output to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p50 slowdown vs the baseline.")
+    args = parser.parse_args(argv)
+    warnings.filterwarnings("ignore")
+    # The report title's emoji is not in DejaVu; fpdf logs that for every document.
+    logging.getLogger("fpdf").setLevel(logging.ERROR)
+
+    batch_sizes = args.batch_sizes or (QUICK_BATCH_SIZES if args.quick else BATCH_SIZES)
+    suite = Suite(args.repeat, args.budget / 4 if args.quick else args.budget, memory=not args.no_memory)
+    rows = load_rows()
+    only = set(args.only or ["models", "sweeps", "reporting"])
+    if "models" in only:
+        bench_models(suite, args.models, batch_sizes, rows)
+        bench_comparison(suite, args.models, batch_sizes, rows)
+    if "sweeps" in only:
+        for model_name in args.models:
+            bench_sweeps(suite, model_name, rows)
+    if "reporting" in only:
+        bench_reporting(suite, rows)
+
+    output = {"meta": metadata(), "results": suite.results}
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            output["regressions"] = compare(suite.results, json.load(f), args.tolerance)
+        for r in output["regressions"]:
+            print(f"REGRESSION {r['group']} {r['name']} {r['params']}: "
+                  f"{r['baseline_p50_ms']:.3f} -> {r['p50_ms']:.3f} ms ({r['ratio']:.2f}x)")
+        status = 1 if output["regressions"] else 0
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(output, f, indent=2)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import argparse
+import logging
+import sys
+import time
+
+from batch import DEFAULT_CHUNKSIZE, predict_csv_stream
+from flat_model import check_parity, flatten
+from ensemble import ModelComparison, compare_csv_stream
+from inference import MODEL_ALIASES, MODEL_FILES, load_model, resolve_model_name
+from registry import get_registry
+from server import MAX_BATCH_ROWS, MAX_WAIT_MS, serve
+
+
+def cmd_predict(args):
+    model = load_model(args.model)
+    start = time.perf_counter()
+    with open(args.input, "rb") as source, open(args.output, "wb") as out:
+        _, summary = predict_csv_stream(model, source, chunksize=args.chunksize, out=out, intervals=args.intervals)
+    elapsed = time.perf_counter() - start
+    print(f"Predicted {summary.rows:,} rows in {elapsed:.2f}s -> {args.output} "
+          f"(total {summary.total:,.2f} kg, mean {summary.mean:,.2f} kg)", file=sys.stderr)
+
+
+def cmd_compare(args):
+    names = [resolve_model_name(name) for name in args.models]
+    comparison = ModelComparison({name: load_model(name) for name in dict.fromkeys(names)})
+    weights = None
+    if args.weights:
+        if len(args.weights) != len(comparison.names):
+            raise ValueError(f"--weights needs one weight per model ({len(comparison.names)})")
+        weights = dict(zip(comparison.names, args.weights))
+    start = time.perf_counter()
+    with open(args.input, "rb") as source, open(args.output, "wb") as out:
+        _, summary = compare_csv_stream(comparison, source, chunksize=args.chunksize, weights=weights, out=out)
+    elapsed = time.perf_counter() - start
+    print(f"Compared {summary.rows:,} rows in {elapsed:.2f}s -> {args.output} "
+          f"(mean disagreement {summary.mean_disagreement:,.2f} kg)", file=sys.stderr)
+    print(summary.metrics().to_string(float_format=lambda v: f"{v:,.4g}"))
+
+
+def cmd_serve(args):
+    serve(args.host, args.port, max_batch_rows=args.max_batch_rows, max_wait_ms=args.max_wait_ms)
+
+
+def cmd_models(args):
+    registry = get_registry()
+    for name, entry in registry.entries.items():
+        metrics = ", ".join(f"{k}={v:.4g}" for k, v in entry.metrics.items()) or "-"
+        print(f"{name}\t{'/'.join(entry.formats)}\ttrained_at={entry.trained_at or '-'}\t{metrics}")
+    print(f"best_model -> {registry.best_name()}")
+
+
+def cmd_export_flat(args):
+    registry = get_registry()
+    for name in args.names or [n for n, e in registry.entries.items() if e.joblib_path]:
+        if args.check:
+            model = registry.load(name, format="joblib")
+            print(f"{name}\tmax relative difference {check_parity(model, flatten(model)):.3g}")
+        else:
+            print(registry.export_flat(name))
+
+
+def cmd_train(args):
+    from train import ARTIFACTS_DIR, run_pipeline
+    print(run_pipeline(args.raw, out_dir=args.out_dir or ARTIFACTS_DIR, n_candidates=args.candidates,
+                       workers=args.workers, promote=args.promote))
+
+
+def cmd_evaluate(args):
+    from train import evaluate_models
+    for name, metrics in evaluate_models(raw_path=args.raw).items():
+        print(f"{name}\t" + ", ".join(f"{k}={v:.4g}" for k, v in metrics.items()))
+    print(f"best_model -> {get_registry().best_name()}")
+
+
+def cmd_features(args):
+    from feature_store import FEATURE_STORE_DIR, build_from_csv
+    store, counts = build_from_csv(args.raw, root=args.store or FEATURE_STORE_DIR, stats_path=args.stats)
+    print(f"{counts['written']} partitions written, {counts['skipped']} unchanged ({len(store.partitions)} total)")
+    if args.export:
+        store.export_csv(args.export)
+
+
+def build_parser():
+    model_names = sorted(set(MODEL_ALIASES) | set(MODEL_FILES))
+    parser = argparse.ArgumentParser(prog="co2", description="Ship CO2 emission prediction without the Streamlit UI.")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("predict", help="Predict emissions for every row of a CSV file.")
+    p.add_argument("--model", default="Random Forest", metavar="{rf,xgboost}", choices=model_names)
+    p.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    p.add_argument("--intervals", action="store_true",
+                   help="Add per-row std and 5/50/95%% quantiles across the forest's trees (Random Forest only).")
+    p.add_argument("input")
+    p.add_argument("output")
+    p.set_defaults(func=cmd_predict)
+
+    p = sub.add_parser("compare", help="Score a CSV with several models side by side, with an optional weighted ensemble.")
+    p.add_argument("--models", nargs="+", default=list(MODEL_FILES), metavar="MODEL", choices=model_names)
+    p.add_argument("--weights", nargs="+", type=float, help="Ensemble weight per model, in --models order.")
+    p.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    p.add_argument("input", help="CSV with the model features, and optionally CO2_emissions to report errors against.")
+    p.add_argument("output")
+    p.set_defaults(func=cmd_compare)
+
+    p = sub.add_parser("models", help="List discovered model artifacts and their metadata.")
+    p.set_defaults(func=cmd_models)
+
+    p = sub.add_parser("export-flat", help="Export models to the compact flat-array format.")
+    p.add_argument("names", nargs="*", help="Registry names (default: every joblib model).")
+    p.add_argument("--check", action="store_true",
+                   help="Only compare flattened predictions with the joblib model's, without writing anything.")
+    p.set_defaults(func=cmd_export_flat)
+
+    p = sub.add_parser("train", help="Regenerate featured data and retrain both models.")
+    p.add_argument("--raw", help="Raw voyage CSV (default: the bundled dataset).")
+    p.add_argument("--out-dir", help="Parent directory for versioned artifacts (default: artifacts/).")
+    p.add_argument("--candidates", type=int, default=27, help="Hyperparameter candidates per model.")
+    p.add_argument("--workers", type=int, help="Worker processes (default: all cores).")
+    p.add_argument("--promote", action="store_true", help="Copy the new models over the ones the app loads.")
+    p.set_defaults(func=cmd_train)
+
+    p = sub.add_parser("evaluate", help="Score the current models on the training holdout split and record the metrics.")
+    p.add_argument("--raw", help="Raw voyage CSV (default: the bundled dataset).")
+    p.set_defaults(func=cmd_evaluate)
+
+    p = sub.add_parser("features", help="Incrementally update the partitioned feature store from a raw CSV.")
+    p.add_argument("--raw", help="Raw voyage CSV (default: the bundled dataset).")
+    p.add_argument("--store", help="Feature store directory (default: feature_store/).")
+    p.add_argument("--stats", help="feature_stats.json to freeze scaling with when creating a new store.")
+    p.add_argument("--export", metavar="CSV", help="Also write the store in the cleaned_featured_data.csv layout.")
+    p.set_defaults(func=cmd_features)
+
+    p = sub.add_parser("serve", help="Serve batched predictions over HTTP (POST /predict).")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8600)
+    p.add_argument("--max-batch-rows", type=int, default=MAX_BATCH_ROWS)
+    p.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    p.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        args.func(args)
+    except (OSError, ValueError, LookupError) as e:
+        sys.exit(f"error: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import tracing
+from batch import DEFAULT_CHUNKSIZE, iter_feature_chunks, write_csv_stream
+from features import TARGET
+from inference import as_features
+
+ENSEMBLE = "Ensemble"
+DISAGREEMENT_COLUMN = "Disagreement (kg)"
+DISAGREEMENT_PCT_COLUMN = "Disagreement (%)"
+TOP_ROWS = 20
+
+
+def prediction_column(name):
+    return f"{name} CO2 (kg)"
+
+
+def normalize_weights(weights):
+    """`weights` ({model name: weight}) scaled to sum to 1."""
+    total = sum(weights.values())
+    if any(w < 0 for w in weights.values()) or total <= 0:
+        raise ValueError("Ensemble weights must be non-negative and not all zero")
+    return {name: w / total for name, w in weights.items()}
+
+
+def weighted_ensemble(predictions, weights):
+    """Weighted mean of the models named in `weights`."""
+    ensemble = None
+    for name, w in normalize_weights(weights).items():
+        ensemble = predictions[name] * w if ensemble is None else ensemble + predictions[name] * w
+    return ensemble
+
+
+def disagreement(predictions, names):
+    """Per-row spread (max - min) of the predictions of the models in `names`."""
+    stacked = np.column_stack([predictions[name] for name in names])
+    return stacked.max(axis=1) - stacked.min(axis=1), stacked.mean(axis=1)
+
+
+def add_comparison_columns(frame, predictions, names):
+    """Add one column per model (and ensemble) plus the per-row disagreement between `names` to `frame`."""
+    for name, values in predictions.items():
+        frame[prediction_column(name)] = values
+    spread, mean = disagreement(predictions, names)
+    frame[DISAGREEMENT_COLUMN] = spread
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frame[DISAGREEMENT_PCT_COLUMN] = 100.0 * spread / np.abs(mean)
+    return frame
+
+
+class ModelComparison:
+    """Scores the same rows with several models at once.
+
+    The feature matrix is coerced once and shared by every model; each model's
+    `predict` runs on its own thread of a pool owned by the comparison. The tree
+    models spend their time in native code that releases the GIL, so with a
+    spare core per model a comparison costs about as much as the slowest model
+    rather than the sum.
+    """
+
+    def __init__(self, models, max_workers=None):
+        self.models = dict(models)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or len(self.models), thread_name_prefix="compare")
+
+    @property
+    def names(self):
+        return list(self.models)
+
+    def _predict(self, name, X):
+        model = self.models[name]
+        with tracing.span("predict", rows=len(X), model=type(model).__name__, stage="compare"):
+            return np.asarray(model.predict(X), dtype=np.float64)
+
+    def predict(self, X, weights=None):
+        """{model name: float64 predictions} for the rows of `X`, plus ENSEMBLE when `weights` is given."""
+        X = as_features(X)
+        futures = {name: self._pool.submit(self._predict, name, X) for name in self.models}
+        predictions = {name: future.result() for name, future in futures.items()}
+        if weights is not None:
+            predictions[ENSEMBLE] = weighted_ensemble(predictions, weights)
+        return predictions
+
+    def frame(self, X, weights=None):
+        """The predictions for `X` side by side, with the per-row disagreement between the models."""
+        predictions = self.predict(X, weights)
+        return add_comparison_columns(pd.DataFrame(index=range(len(X))), predictions, self.names)
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+
+class ComparisonSummary:
+    """Running per-model aggregates over a streamed comparison, updated one chunk at a time.
+
+    When chunks carry actual emissions (`actual_column`), the error sums behind
+    RMSE, MAE, bias and R² are kept for the rows that have a value.
+    """
+
+    def __init__(self, names, actual_column=TARGET, top_rows=TOP_ROWS):
+        self.names = list(names)
+        self.actual_column = actual_column
+        self.top_rows = top_rows
+        self.rows = 0
+        self.chunks = 0
+        self.total = dict.fromkeys(self.names, 0.0)
+        self.disagreement_sum = 0.0
+        self.disagreement_max = 0.0
+        self.top = None
+        self.scored = 0
+        self.actual_sum = 0.0
+        self.actual_sq_sum = 0.0
+        self.error_sum = dict.fromkeys(self.names, 0.0)
+        self.abs_error_sum = dict.fromkeys(self.names, 0.0)
+        self.sq_error_sum = dict.fromkeys(self.names, 0.0)
+
+    def update(self, features, predictions, chunk):
+        self.rows += len(chunk)
+        self.chunks += 1
+        for name in self.names:
+            self.total[name] += float(predictions[name].sum())
+        spread = chunk[DISAGREEMENT_COLUMN]
+        self.disagreement_sum += float(spread.sum())
+        self.disagreement_max = max(self.disagreement_max, float(spread.max()))
+        candidates = chunk.nlargest(self.top_rows, DISAGREEMENT_COLUMN)
+        if self.top is not None:
+            candidates = pd.concat([self.top, candidates], ignore_index=True).nlargest(self.top_rows, DISAGREEMENT_COLUMN)
+        self.top = candidates.reset_index(drop=True)
+        if self.actual_column not in chunk:
+            return
+        actual = chunk[self.actual_column].to_numpy(dtype=np.float64)
+        known = ~np.isnan(actual)
+        if not known.any():
+            return
+        actual = actual[known]
+        self.scored += len(actual)
+        self.actual_sum += float(actual.sum())
+        self.actual_sq_sum += float(actual @ actual)
+        for name in self.names:
+            error = predictions[name][known] - actual
+            self.error_sum[name] += float(error.sum())
+            self.abs_error_sum[name] += float(np.abs(error).sum())
+            self.sq_error_sum[name] += float(error @ error)
+
+    @property
+    def mean_disagreement(self):
+        return self.disagreement_sum / self.rows if self.rows else float("nan")
+
+    def metrics(self):
+        """One row per model: total and mean prediction, plus RMSE, MAE, bias and R² when actuals were seen."""
+        rows = {}
+        total_ss = self.actual_sq_sum - self.actual_sum**2 / self.scored if self.scored else 0.0
+        for name in self.names:
+            row = {"total_kg": self.total[name], "mean_kg": self.total[name] / self.rows if self.rows else float("nan")}
+            if self.scored:
+                row["rmse"] = (self.sq_error_sum[name] / self.scored) ** 0.5
+                row["mae"] = self.abs_error_sum[name] / self.scored
+                row["bias"] = self.error_sum[name] / self.scored
+                row["r2"] = 1.0 - self.sq_error_sum[name] / total_ss if total_ss > 0 else float("nan")
+            rows[name] = row
+        return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def iter_comparison_chunks(comparison, source, chunksize=DEFAULT_CHUNKSIZE, weights=None):
+    """Yield (features, predictions, chunk) for `source` with every model of `comparison`, like `batch.iter_prediction_chunks`.
+
+    Each chunk gets a prediction column per model (and ENSEMBLE with `weights`)
+    and the per-row disagreement; a TARGET column, if present, is kept.
+    """
+    for features, chunk in iter_feature_chunks(source, chunksize, optional_columns=(TARGET,)):
+        predictions = comparison.predict(features, weights)
+        add_comparison_columns(chunk, predictions, comparison.names)
+        yield features, predictions, chunk
+
+
+def compare_csv_stream(comparison, source, chunksize=DEFAULT_CHUNKSIZE, weights=None, on_chunk=None, out=None):
+    """Score every row of the CSV in `source` with every model of `comparison`, like `batch.predict_csv_stream`.
+
+    Returns the output file rewound and a ComparisonSummary, which includes error
+    metrics against TARGET when the CSV has that column.
+    """
+    summary = ComparisonSummary(comparison.names + ([ENSEMBLE] if weights is not None else []))
+    return write_csv_stream(iter_comparison_chunks(comparison, source, chunksize, weights), summary, on_chunk, out)
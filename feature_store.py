@@ -0,0 +1,136 @@
+import json
+import logging
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURED_COLUMNS, RAW_DATA, TARGET, FeatureStats, featurize
+from registry import BASE_DIR
+
+logger = logging.getLogger("co2.feature_store")
+
+FEATURE_STORE_DIR = os.path.join(BASE_DIR, "feature_store")
+# Granularity at which changes are detected ...
+PARTITION_KEYS = ["ship_id", "month"]
+# ... and at which featurized rows are grouped into Parquet files.
+FILE_KEY = "month"
+MANIFEST = "manifest.json"
+PARTITIONS_DIR = "partitions"
+# Two independent row hashes make accidental fingerprint collisions negligible.
+_HASH_KEYS = ("co2-features-key", "co2-features-alt")
+
+
+def partition_fingerprints(raw):
+    """Order-independent content fingerprint of every (ship_id, month) partition of `raw`.
+
+    Rows are hashed once, vectorized, and combined per partition by a wrapping
+    uint64 sum, so the cost is a single pass over the data however many
+    partitions there are.
+    """
+    hashes = raw[PARTITION_KEYS].copy()
+    for i, hash_key in enumerate(_HASH_KEYS):
+        hashes[f"h{i}"] = pd.util.hash_pandas_object(raw, index=False, hash_key=hash_key).to_numpy()
+    grouped = hashes.groupby(PARTITION_KEYS, sort=False)
+    sums = grouped.agg(lambda h: np.add.reduce(h.to_numpy(), dtype=np.uint64))
+    sizes = grouped.size()
+    return {
+        "/".join(map(str, key)): f"{rows}-{a:016x}{b:016x}"
+        for key, rows, a, b in zip(sums.index, sizes.to_numpy(), sums["h0"].to_numpy(), sums["h1"].to_numpy())
+    }
+
+
+def _file_name(value):
+    return re.sub(r"[^A-Za-z0-9_-]+", "-", str(value)) + ".parquet"
+
+
+class FeatureStore:
+    """Featurized voyage data in Parquet files, updated incrementally.
+
+    `update()` fingerprints each (ship_id, month) partition of the raw data and
+    featurizes only the partitions that are new or whose content changed, in
+    one vectorized call. Those rows then replace the old ones in the per-month
+    Parquet files they belong to; other files are not touched. FeatureStats
+    are frozen the first time the store is built (or taken from `stats`) and
+    persisted in the manifest, so appending data never shifts the scale of
+    rows already stored.
+    """
+
+    def __init__(self, root=FEATURE_STORE_DIR, stats=None):
+        self.root = root
+        self.partitions_dir = os.path.join(root, PARTITIONS_DIR)
+        self.manifest_path = os.path.join(root, MANIFEST)
+        self.stats = stats
+        self.partitions = {}
+        self.files = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            self.partitions = manifest["partitions"]
+            self.files = manifest["files"]
+            stored = FeatureStats.from_dict(manifest["stats"])
+            if self.stats is not None and self.stats.to_dict() != stored.to_dict():
+                raise ValueError(f"Feature stats differ from the ones {root} was built with; use a new store")
+            self.stats = stored
+
+    def _save_manifest(self):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"stats": self.stats.to_dict(), "files": self.files, "partitions": self.partitions}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def update(self, raw):
+        """Featurize new or changed partitions of `raw`; returns counts of written and skipped partitions."""
+        os.makedirs(self.partitions_dir, exist_ok=True)
+        if self.stats is None:
+            self.stats = FeatureStats.fit(raw)
+        fingerprints = partition_fingerprints(raw)
+        changed = {name for name, fp in fingerprints.items() if self.partitions.get(name) != fp}
+        counts = {"written": len(changed), "skipped": len(fingerprints) - len(changed)}
+        if changed:
+            names = raw[PARTITION_KEYS[0]].astype(str)
+            for key in PARTITION_KEYS[1:]:
+                names = names + "/" + raw[key].astype(str)
+            featured = featurize(raw[names.isin(changed).to_numpy()], self.stats)
+            featured["_partition"] = names[names.isin(changed)].to_numpy()
+            for value, rows in featured.groupby(FILE_KEY, sort=False):
+                self._write_file(value, rows)
+            self.partitions.update((name, fingerprints[name]) for name in changed)
+            self._save_manifest()
+        logger.info("Feature store %s: %d partitions written, %d unchanged", self.root, counts["written"], counts["skipped"])
+        return counts
+
+    def _write_file(self, value, rows):
+        """Replace the changed partitions' rows inside one per-FILE_KEY Parquet file."""
+        filename = self.files.setdefault(str(value), _file_name(value))
+        path = os.path.join(self.partitions_dir, filename)
+        if os.path.exists(path):
+            existing = pd.read_parquet(path)
+            existing = existing[~existing["_partition"].isin(rows["_partition"].unique())]
+            rows = pd.concat([existing, rows], ignore_index=True)
+        tmp_path = f"{path}.tmp"
+        rows.reset_index(drop=True).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    def load(self, columns=None):
+        """All stored features as one frame (FEATURED_COLUMNS plus the target when present)."""
+        if not self.files:
+            return pd.DataFrame(columns=FEATURED_COLUMNS)
+        files = [os.path.join(self.partitions_dir, f) for f in self.files.values()]
+        frame = pd.read_parquet(files, columns=columns)
+        return frame.drop(columns="_partition", errors="ignore")
+
+    def export_csv(self, path):
+        """Write the store in the cleaned_featured_data.csv layout."""
+        self.load(columns=FEATURED_COLUMNS).to_csv(path, index=False)
+
+    def training_frame(self):
+        frame = self.load()
+        return frame.dropna(subset=[TARGET]) if TARGET in frame else frame
+
+
+def build_from_csv(raw_path=None, root=FEATURE_STORE_DIR, stats_path=None):
+    stats = FeatureStats.load(stats_path) if stats_path else None
+    store = FeatureStore(root, stats=stats)
+    return store, store.update(pd.read_csv(raw_path or os.path.join(BASE_DIR, RAW_DATA)))
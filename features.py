@@ -0,0 +1,90 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+RAW_DATA = "ship_fuel_efficiency (1).csv"
+FEATURED_DATA = "cleaned_featured_data.csv"
+TARGET = "CO2_emissions"
+CATEGORICAL_COLUMNS = ["ship_type", "fuel_type"]
+NORMALIZED_COLUMNS = ["distance", "engine_efficiency", "emission_efficiency"]
+# Column layout of cleaned_featured_data.csv.
+FEATURED_COLUMNS = [
+    "ship_id", "ship_type", "route_id", "month", "distance", "fuel_type", "weather_conditions",
+    "engine_efficiency", "emission_efficiency", "efficiency_distance", "distance_bin", "efficiency_distance_log",
+]
+DISTANCE_BIN_WIDTH = 100
+
+
+class FeatureStats:
+    """Label encodings and min-max ranges learned from one dataset and reused for any later one.
+
+    Keeping these fixed means rows featurized at different times share a scale.
+    """
+
+    def __init__(self, categories, ranges):
+        self.categories = categories
+        self.ranges = ranges
+
+    @classmethod
+    def fit(cls, raw):
+        derived = add_emission_efficiency(raw)
+        categories = {col: sorted(derived[col].dropna().unique().tolist()) for col in CATEGORICAL_COLUMNS}
+        ranges = {col: (float(derived[col].min()), float(derived[col].max())) for col in NORMALIZED_COLUMNS}
+        return cls(categories, ranges)
+
+    def to_dict(self):
+        return {"categories": self.categories, "ranges": {k: list(v) for k, v in self.ranges.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["categories"], {k: tuple(v) for k, v in data["ranges"].items()})
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def add_emission_efficiency(raw):
+    """kg of CO2 emitted per litre of fuel burned, the unit the app's slider uses."""
+    raw = raw.copy()
+    raw["emission_efficiency"] = raw[TARGET] / raw["fuel_consumption"]
+    return raw
+
+
+def distance_bins(distance):
+    upper = max(DISTANCE_BIN_WIDTH, int(np.ceil(distance.max() / DISTANCE_BIN_WIDTH)) * DISTANCE_BIN_WIDTH)
+    edges = np.arange(0, upper + DISTANCE_BIN_WIDTH, DISTANCE_BIN_WIDTH)
+    labels = [f"{lo + (lo > 0)}-{hi}km" for lo, hi in zip(edges[:-1], edges[1:])]
+    return pd.cut(distance, edges, labels=labels, include_lowest=True).astype(str)
+
+
+def featurize(raw, stats):
+    """Derive the cleaned/featured columns from raw voyage records.
+
+    Returns FEATURED_COLUMNS plus TARGET when the raw data has it. Categories
+    unseen by `stats` encode as -1; values outside the fitted range scale
+    outside [0, 1] rather than being clipped.
+    """
+    df = add_emission_efficiency(raw)
+    out = pd.DataFrame(index=df.index)
+    for col in ["ship_id", "route_id", "month", "weather_conditions"]:
+        out[col] = df[col]
+    for col in CATEGORICAL_COLUMNS:
+        codes = {value: i for i, value in enumerate(stats.categories[col])}
+        out[col] = df[col].map(codes).fillna(-1).astype(int)
+    for col in NORMALIZED_COLUMNS:
+        lo, hi = stats.ranges[col]
+        out[col] = (df[col] - lo) / ((hi - lo) or 1.0)
+    out["efficiency_distance"] = out["distance"] * out["engine_efficiency"]
+    out["distance_bin"] = distance_bins(df["distance"])
+    out["efficiency_distance_log"] = np.log1p(out["efficiency_distance"])
+    out = out[FEATURED_COLUMNS]
+    if TARGET in df:
+        out[TARGET] = df[TARGET]
+    return out
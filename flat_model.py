@@ -0,0 +1,218 @@
+import json
+import os
+
+import numpy as np
+
+FLAT_SUFFIX = ".flat"
+# Largest relative difference from the source model's `predict` a flat export may show, by aggregation.
+# Forest means agree to rounding; XGBoost sums its leaves in float32 where the flat format uses float64.
+PARITY_RTOL = {"mean": 1e-9, "sum": 1e-5}
+_ARRAYS = ("feature", "threshold", "left", "right", "value", "default_left", "roots")
+
+
+class FlatTreeEnsemble:
+    """Tree ensemble stored as a handful of flat node arrays.
+
+    Every tree of a Random Forest or XGBoost booster is laid out in the same
+    arrays, indexed by a global node id; `roots` holds each tree's first node.
+    Leaves point back at themselves, so traversal is a fixed number of
+    vectorized steps over all rows and trees at once. The arrays are saved as
+    plain `.npy` files in a directory and can be memory-mapped on load, so
+    forked workers share the same pages.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, default_left, roots,
+                 max_depth, aggregation="mean", base_score=0.0, strict=False, feature_names=None, n_features=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.default_left = default_left
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.aggregation = aggregation
+        self.base_score = float(base_score)
+        self.strict = bool(strict)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        # Input width of the source model; exports written before it was recorded fall back to the widest split.
+        self.n_features = int(n_features) if n_features is not None else int(feature.max()) + 1
+        # Interleaved (left, right) pairs so one gather picks the next node.
+        self._children = np.stack([left, right], axis=1).ravel()
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def leaf_indices(self, X, max_cells=65_536):
+        """Global leaf node id reached by every (row, tree) pair, shape (n_rows, n_trees)."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_features = X.shape[1]
+        has_nan = bool(np.isnan(X).any())
+        out = np.empty((len(X), self.n_trees), dtype=np.int32)
+        step = max(1, max_cells // max(self.n_trees, 1))
+        for start in range(0, len(X), step):
+            rows = X[start:start + step]
+            flat_rows = rows.ravel()
+            row_offsets = (np.arange(len(rows), dtype=np.int32) * n_features)[:, None]
+            nodes = np.broadcast_to(self.roots, (len(rows), self.n_trees)).copy()
+            for _ in range(self.max_depth):
+                x = flat_rows.take(row_offsets + self.feature.take(nodes))
+                threshold = self.threshold.take(nodes)
+                go_right = x >= threshold if self.strict else x > threshold
+                if has_nan:
+                    go_right = np.where(np.isnan(x), ~self.default_left.take(nodes), go_right)
+                nodes = self._children.take(nodes * 2 + go_right)
+            out[start:start + len(rows)] = nodes
+        return out
+
+    def predict_per_tree(self, X):
+        """Contribution of each tree for each row, shape (n_rows, n_trees)."""
+        return self.value[self.leaf_indices(X)]
+
+    def predict(self, X):
+        per_tree = self.predict_per_tree(X)
+        if self.aggregation == "mean":
+            return per_tree.mean(axis=1)
+        return self.base_score + per_tree.sum(axis=1, dtype=np.float64)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        meta = {
+            "max_depth": self.max_depth,
+            "aggregation": self.aggregation,
+            "base_score": self.base_score,
+            "strict": self.strict,
+            "feature_names": self.feature_names,
+            "n_features": self.n_features,
+        }
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in _ARRAYS}
+        return cls(**arrays, **meta)
+
+
+def _self_loop_leaves(left, right, offset):
+    """Turn -1 child pointers into self-loops and shift child ids by `offset`."""
+    nodes = np.arange(len(left), dtype=np.int32)
+    is_leaf = left < 0
+    left = np.where(is_leaf, nodes, left).astype(np.int32) + offset
+    right = np.where(is_leaf, nodes, right).astype(np.int32) + offset
+    return left, right, is_leaf
+
+
+def _concatenate(parts, max_depth, **kwargs):
+    columns = list(zip(*parts))
+    feature, threshold, left, right, value, default_left = (np.concatenate(c) for c in columns)
+    roots = np.cumsum([0] + [len(p[0]) for p in parts[:-1]]).astype(np.int32)
+    return FlatTreeEnsemble(feature, threshold, left, right, value, default_left, roots, max_depth, **kwargs)
+
+
+def from_sklearn_forest(model):
+    """Flatten a fitted sklearn RandomForestRegressor (single output)."""
+    parts = []
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        left, right, is_leaf = _self_loop_leaves(tree.children_left, tree.children_right, offset)
+        feature = np.where(is_leaf, 0, tree.feature).astype(np.int32)
+        missing_left = getattr(tree, "missing_go_to_left", np.zeros(tree.node_count, dtype=np.uint8))
+        parts.append((
+            feature,
+            tree.threshold.astype(np.float64),
+            left,
+            right,
+            tree.value[:, 0, 0].astype(np.float64),
+            np.asarray(missing_left, dtype=bool),
+        ))
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+    return _concatenate(parts, max_depth, aggregation="mean", strict=False,
+                        feature_names=getattr(model, "feature_names_in_", None), n_features=model.n_features_in_)
+
+
+def from_xgboost(model):
+    """Flatten a fitted XGBRegressor with a `reg:squarederror`-style identity link."""
+    booster = model.get_booster()
+    learner = json.loads(booster.save_raw("json").decode("utf-8"))["learner"]
+    base_score = float(learner["learner_model_param"]["base_score"].strip("[]"))
+    parts = []
+    offset = 0
+    max_depth = 0
+    for tree in learner["gradient_booster"]["model"]["trees"]:
+        left, right, is_leaf = _self_loop_leaves(np.asarray(tree["left_children"]), np.asarray(tree["right_children"]), offset)
+        conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+        parts.append((
+            np.where(is_leaf, 0, tree["split_indices"]).astype(np.int32),
+            conditions,
+            left,
+            right,
+            # XGBoost stores leaf outputs in split_conditions.
+            np.where(is_leaf, conditions, 0.0).astype(np.float64),
+            np.asarray(tree["default_left"], dtype=bool),
+        ))
+        offset += len(conditions)
+        max_depth = max(max_depth, _depth(tree["left_children"], tree["right_children"]))
+    return _concatenate(parts, max_depth, aggregation="sum", base_score=base_score, strict=True,
+                        feature_names=booster.feature_names, n_features=booster.num_features())
+
+
+def _depth(left, right):
+    depth = 0
+    frontier = [0]
+    while frontier:
+        frontier = [c for n in frontier for c in (left[n], right[n]) if c >= 0]
+        depth += bool(frontier)
+    return depth
+
+
+def parity_rows(flat, n=4096, seed=0):
+    """Rows to compare a flat export against its source model on.
+
+    Half take every feature value from the split thresholds themselves, so the
+    `<=` vs `<` convention of each library is exercised; the rest are uniform
+    over (and slightly beyond) the threshold range of each feature.
+    """
+    rng = np.random.default_rng(seed)
+    internal = flat.left != np.arange(len(flat.left))
+    columns = []
+    for i in range(flat.n_features):
+        thresholds = np.asarray(flat.threshold[internal & (flat.feature == i)], dtype=np.float32)
+        if len(thresholds) == 0:
+            thresholds = np.zeros(1, dtype=np.float32)
+        lo, hi = float(thresholds.min()), float(thresholds.max())
+        margin = 0.1 * (hi - lo) or 1.0
+        columns.append(np.concatenate([rng.choice(thresholds, n // 2),
+                                       rng.uniform(lo - margin, hi + margin, n - n // 2)]))
+    return np.column_stack(columns).astype(np.float32)
+
+
+def check_parity(model, flat, X=None):
+    """Largest relative difference between `flat.predict` and `model.predict` on `X` (default: parity_rows).
+
+    Raises ValueError when it exceeds PARITY_RTOL for the ensemble's aggregation.
+    """
+    X = parity_rows(flat) if X is None else np.ascontiguousarray(X, dtype=np.float32)
+    expected = np.asarray(model.predict(X), dtype=np.float64)
+    difference = np.abs(flat.predict(X) - expected) / np.maximum(np.abs(expected), 1.0)
+    worst = float(difference.max()) if len(difference) else 0.0
+    if worst > PARITY_RTOL[flat.aggregation]:
+        raise ValueError(f"Flat export of {type(model).__name__} differs from it by up to {worst:.3g} (relative), "
+                         f"above the {PARITY_RTOL[flat.aggregation]:g} tolerance")
+    return worst
+
+
+def flatten(model):
+    if hasattr(model, "estimators_"):
+        return from_sklearn_forest(model)
+    if hasattr(model, "get_booster"):
+        return from_xgboost(model)
+    raise TypeError(f"Cannot flatten model of type {type(model).__name__}")
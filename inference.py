@@ -0,0 +1,73 @@
+import os
+import threading
+
+import numpy as np
+
+from registry import BEST_MODEL, get_registry
+
+MODEL_FILES = {
+    "Random Forest": "optimized_random_forest_model.joblib",
+    "XGBoost": "optimized_xgboost_model.joblib",
+}
+MODEL_ALIASES = {
+    "random forest": "Random Forest",
+    "random-forest": "Random Forest",
+    "random_forest": "Random Forest",
+    "rf": "Random Forest",
+    "xgboost": "XGBoost",
+    "xgb": "XGBoost",
+    "best": BEST_MODEL,
+    "best model": BEST_MODEL,
+    "best_model": BEST_MODEL,
+}
+# Artifact format and joblib/np.load mmap_mode used by load_model; see registry.py.
+MODEL_FORMAT = os.environ.get("CO2_MODEL_FORMAT") or None
+MMAP_MODE = os.environ.get("CO2_MMAP_MODE") or None
+# Column order the models were fitted with.
+FEATURE_NAMES = ["distance", "engine_efficiency", "emission_efficiency"]
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def resolve_model_name(name):
+    if name in MODEL_FILES:
+        return name
+    try:
+        name = MODEL_ALIASES[name.strip().lower()]
+    except KeyError:
+        raise ValueError(f"Unknown model {name!r}; choose one of: {', '.join(MODEL_FILES)}") from None
+    if name == BEST_MODEL:
+        best = get_registry().best_name()
+        name = next((display for display, filename in MODEL_FILES.items() if filename == f"{best}.joblib"), None)
+        if name is None:
+            raise ValueError(f"Best model {best!r} is not one of: {', '.join(MODEL_FILES)}")
+    return name
+
+
+def load_model(model_name):
+    """Load a model once per process; later calls return the same object."""
+    model_name = resolve_model_name(model_name)
+    model = _models.get(model_name)
+    if model is None:
+        with _models_lock:
+            model = _models.get(model_name)
+            if model is None:
+                artifact = os.path.splitext(MODEL_FILES[model_name])[0]
+                model = get_registry().load(artifact, format=MODEL_FORMAT, mmap_mode=MMAP_MODE)
+                _models[model_name] = model
+    return model
+
+
+def as_features(rows):
+    """Coerce rows of (distance, engine efficiency, emission efficiency) to a contiguous float32 matrix."""
+    features = np.ascontiguousarray(rows, dtype=np.float32)
+    if features.ndim == 1:
+        features = features.reshape(1, -1)
+    if features.ndim != 2 or features.shape[1] != len(FEATURE_NAMES):
+        raise ValueError(f"Expected rows of {len(FEATURE_NAMES)} features ({', '.join(FEATURE_NAMES)}), got shape {features.shape}")
+    return features
+
+
+def predict(model_name, rows):
+    return load_model(model_name).predict(as_features(rows))
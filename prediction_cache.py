@@ -0,0 +1,126 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from joblib import dump, load
+
+import tracing
+from registry import artifact_version
+
+# Bucket width per feature (distance km, engine efficiency, emission efficiency).
+DEFAULT_QUANTA = (1.0, 1e-3, 1e-3)
+DEFAULT_MAX_ENTRIES = 200_000
+
+
+class PredictionCache:
+    """Process-wide LRU cache of model predictions keyed on quantized inputs.
+
+    Inputs are snapped to a grid of `quanta` before prediction, so every row in
+    the same bucket gets the same (deterministic) prediction no matter which
+    row filled the bucket first. Thread-safe, so one instance can be shared by
+    all Streamlit sessions. When `path` is given, entries are loaded from it on
+    creation and written back by `save()`.
+
+    Keys include the model's `registry.artifact_version`, so predictions of a
+    model whose artifact has since been replaced (retrained, promoted or
+    loaded in another format) are never served; the first lookup under a new
+    version drops that model's old entries.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, quanta=DEFAULT_QUANTA, path=None):
+        self.max_entries = max_entries
+        self.quanta = np.asarray(quanta, dtype=np.float64)
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if path and os.path.exists(path):
+            self._entries.update(load(path))
+            self._evict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+    def predict(self, model_name, model, features):
+        """Return predictions for `features`, calling `model.predict` once for all uncached buckets."""
+        features = np.asarray(features, dtype=np.float64).reshape(-1, len(self.quanta))
+        buckets = np.rint(features / self.quanta).astype(np.int64)
+        version = artifact_version(model)
+        keys = [(model_name, version) + row for row in map(tuple, buckets.tolist())]
+        predictions = np.empty(len(keys), dtype=np.float64)
+        missing = {}
+        with self._lock:
+            if self._versions.get(model_name, object()) != version:
+                self._drop_stale(model_name, version)
+            for i, key in enumerate(keys):
+                value = self._entries.get(key)
+                if value is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    self._entries.move_to_end(key)
+                    predictions[i] = value
+            missed_rows = sum(len(rows) for rows in missing.values())
+            self.hits += len(keys) - missed_rows
+            self.misses += missed_rows
+        if not missing:
+            return predictions
+        first_rows = [rows[0] for rows in missing.values()]
+        snapped = (buckets[first_rows] * self.quanta).astype(np.float32)
+        with tracing.span("predict", rows=len(snapped), model=type(model).__name__, stage="cache_miss"):
+            computed = model.predict(snapped)
+        with self._lock:
+            for (key, rows), value in zip(missing.items(), computed.tolist()):
+                predictions[rows] = value
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            self._evict()
+            self._dirty = True
+        return predictions
+
+    def _drop_stale(self, model_name, version):
+        stale = [k for k in self._entries if k[0] == model_name and k[1] != version]
+        for key in stale:
+            del self._entries[key]
+        self._versions[model_name] = version
+        self._dirty = self._dirty or bool(stale)
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._dirty = True
+
+    def save(self):
+        """Write the entries to `path` if anything changed since the last save."""
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            snapshot = OrderedDict(self._entries)
+            self._dirty = False
+        tmp_path = f"{self.path}.tmp"
+        dump(snapshot, tmp_path)
+        os.replace(tmp_path, self.path)
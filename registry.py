@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import threading
+import weakref
+
+from joblib import load
+
+from flat_model import FLAT_SUFFIX, FlatTreeEnsemble, check_parity, flatten
+
+logger = logging.getLogger("co2.registry")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BEST_MODEL = "best_model"
+# Used to pick the best model when no alias is recorded: (metric, lower_is_better).
+RANKING_METRIC = ("rmse", True)
+
+# Artifact version of every model object loaded through a registry; see artifact_version().
+_versions = weakref.WeakKeyDictionary()
+
+
+def artifact_version(model):
+    """Format, size and mtime of the artifact `model` was loaded from, or None if it did not come from a registry.
+
+    Changes whenever the file is replaced (retraining, promotion, re-export), so
+    anything derived from a model's predictions can be keyed on it.
+    """
+    try:
+        return _versions.get(model)
+    except TypeError:
+        return None
+
+
+class ModelEntry:
+    """One discovered model: its joblib and/or flat artifacts plus sidecar metadata."""
+
+    def __init__(self, name, joblib_path=None, flat_path=None, metadata=None):
+        self.name = name
+        self.joblib_path = joblib_path
+        self.flat_path = flat_path
+        self.metadata = metadata or {}
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    @property
+    def feature_names(self):
+        return self.metadata.get("feature_names")
+
+    @property
+    def trained_at(self):
+        return self.metadata.get("trained_at")
+
+    @property
+    def metrics(self):
+        return self.metadata.get("metrics", {})
+
+    @property
+    def formats(self):
+        return [f for f, path in (("joblib", self.joblib_path), ("flat", self.flat_path)) if path]
+
+    @property
+    def flat_is_stale(self):
+        """Whether the joblib artifact was replaced after the flat export was written."""
+        if not (self.flat_path and self.joblib_path):
+            return False
+        return os.path.getmtime(self.joblib_path) > os.path.getmtime(os.path.join(self.flat_path, "meta.json"))
+
+    def load(self, format=None, mmap_mode=None):
+        """Load (once) and return the model in `format`; defaults to joblib unless only a flat export exists."""
+        format = format or ("joblib" if self.joblib_path else "flat")
+        if format not in self.formats:
+            raise ValueError(f"Model {self.name!r} has no {format} artifact (available: {', '.join(self.formats)})")
+        if format == "flat" and self.flat_is_stale:
+            raise ValueError(f"Flat export of {self.name!r} is older than its joblib artifact; "
+                             f"re-run `python cli.py export-flat {self.name}`")
+        key = (format, mmap_mode)
+        with self._lock:
+            model = self._loaded.get(key)
+            if model is None:
+                if format == "flat":
+                    model = FlatTreeEnsemble.load(self.flat_path, mmap_mode=mmap_mode)
+                    stat = os.stat(os.path.join(self.flat_path, "meta.json"))
+                else:
+                    model = load(self.joblib_path, mmap_mode=mmap_mode)
+                    stat = os.stat(self.joblib_path)
+                _versions[model] = f"{format}:{stat.st_size}:{stat.st_mtime_ns}"
+                self._loaded[key] = model
+        return model
+
+    def __repr__(self):
+        return f"ModelEntry({self.name!r}, formats={self.formats})"
+
+
+class ModelRegistry:
+    """Discovers model artifacts under `root` and loads them lazily on first use.
+
+    For every `<name>.joblib` (or exported `<name>.flat/` directory) an entry is
+    created, with metadata read from an optional `<name>.json` sidecar holding
+    `feature_names`, `trained_at` and `metrics`. `best_model` resolves to the
+    alias recorded in `best_model.json` if present, otherwise to the entry with
+    the best RANKING_METRIC.
+    """
+
+    def __init__(self, root=BASE_DIR):
+        self.root = root
+        self._entries = None
+        self._best_alias = None
+        self._lock = threading.Lock()
+
+    def _read_metadata(self, name):
+        path = os.path.join(self.root, f"{name}.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def discover(self):
+        entries = {}
+        for filename in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, filename)
+            name, ext = os.path.splitext(filename)
+            if ext == ".joblib":
+                entries.setdefault(name, ModelEntry(name)).joblib_path = path
+            elif ext == FLAT_SUFFIX and os.path.isdir(path):
+                entries.setdefault(name, ModelEntry(name)).flat_path = path
+        for name, entry in entries.items():
+            entry.metadata = self._read_metadata(name)
+        self._best_alias = self._read_metadata(BEST_MODEL).get("alias")
+        return entries
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            with self._lock:
+                if self._entries is None:
+                    self._entries = self.discover()
+        return self._entries
+
+    def refresh(self):
+        with self._lock:
+            self._entries = None
+
+    def names(self):
+        return list(self.entries)
+
+    def best_name(self):
+        entries = self.entries
+        if self._best_alias in entries:
+            return self._best_alias
+        metric, lower_is_better = RANKING_METRIC
+        ranked = [e for e in entries.values() if metric in e.metrics]
+        if ranked:
+            best = min(ranked, key=lambda e: e.metrics[metric] if lower_is_better else -e.metrics[metric])
+            return best.name
+        if not entries:
+            raise LookupError(f"No model artifacts found in {self.root}")
+        fallback = next(iter(entries))
+        logger.warning("No best_model alias or %s metrics recorded; using %s", metric, fallback)
+        return fallback
+
+    def get(self, name):
+        if name == BEST_MODEL:
+            name = self.best_name()
+        try:
+            return self.entries[name]
+        except KeyError:
+            raise LookupError(f"Unknown model {name!r}; available: {', '.join(self.entries)}") from None
+
+    def load(self, name, format=None, mmap_mode=None):
+        return self.get(name).load(format=format, mmap_mode=mmap_mode)
+
+    def export_flat(self, name):
+        """Write `<name>.flat/` next to the joblib artifact and register it.
+
+        The export is only written once its predictions match the joblib model's
+        within flat_model.PARITY_RTOL.
+        """
+        entry = self.get(name)
+        path = os.path.join(self.root, f"{entry.name}{FLAT_SUFFIX}")
+        model = entry.load(format="joblib")
+        flat = flatten(model)
+        deviation = check_parity(model, flat)
+        logger.info("Flat export of %s matches joblib predictions to %.3g (relative)", entry.name, deviation)
+        flat.save(path)
+        entry.flat_path = path
+        return path
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
@@ -0,0 +1,216 @@
+import atexit
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from fontTools import subset, ttLib
+from fpdf import FPDF
+
+import tracing
+from registry import BASE_DIR
+
+FONT_FAMILY = "DejaVu"
+FONT_FILES = {"": "DejaVuSans.ttf", "B": "DejaVuSans-Bold.ttf"}
+# Latin, Greek, Cyrillic, punctuation, sub/superscripts (CO₂), currency, arrows, math and symbols.
+FONT_UNICODES = [
+    *range(0x0020, 0x0250),
+    *range(0x0370, 0x0530),
+    *range(0x2000, 0x2400),
+    *range(0x2500, 0x2800),
+]
+REPORT_TITLE = "🌱 Ship CO2 Emission Prediction Report"
+THANK_YOU = "Thank you for using Ship CO2 Emission Predictor!"
+FEATURE_IMPORTANCES = [("distance", 0.9449), ("emission_efficiency", 0.0309), ("engine_efficiency", 0.0242)]
+MAX_CACHED_REPORTS = 64
+
+_font_lock = threading.Lock()
+_font_paths = None
+
+
+def subset_fonts():
+    """Subset the DejaVu fonts to FONT_UNICODES once per process and return their paths.
+
+    The full fonts are ~1.4 MB and fontTools re-parses them for every document;
+    the subsets are a fraction of that, and fpdf further embeds only the glyphs
+    a report actually uses.
+    """
+    global _font_paths
+    with _font_lock:
+        if _font_paths is None:
+            font_dir = tempfile.mkdtemp(prefix="co2-fonts-")
+            atexit.register(shutil.rmtree, font_dir, ignore_errors=True)
+            options = subset.Options()
+            options.notdef_outline = True
+            options.drop_tables += ["FFTM"]
+            paths = {}
+            for style, filename in FONT_FILES.items():
+                font = ttLib.TTFont(os.path.join(BASE_DIR, filename))
+                subsetter = subset.Subsetter(options)
+                subsetter.populate(unicodes=FONT_UNICODES)
+                subsetter.subset(font)
+                paths[style] = os.path.join(font_dir, filename)
+                font.save(paths[style])
+            _font_paths = paths
+    return _font_paths
+
+
+class ReportPDF(FPDF):
+    def __init__(self, logo=None):
+        super().__init__()
+        self.logo = logo
+        for style, path in subset_fonts().items():
+            self.add_font(FONT_FAMILY, style, path)
+
+    def header(self):
+        if self.logo is not None:
+            self.image(io.BytesIO(self.logo), x=10, y=8, w=25)
+        self.set_fill_color(0, 119, 68)
+        self.rect(0, 0, 210, 18, 'F')
+        self.set_font(FONT_FAMILY, 'B', 18)
+        self.set_text_color(255, 255, 255)
+        self.cell(0, 12, REPORT_TITLE, ln=True, align="C")
+        self.ln(5)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font(FONT_FAMILY, "", 10)
+        self.set_text_color(120, 120, 120)
+        self.cell(0, 10, f"Page {self.page_no()}  |  Powered by VNIT Nagpur", 0, 0, "C")
+
+    def section_title(self, text, size=14):
+        self.set_font(FONT_FAMILY, 'B', size)
+        self.set_text_color(0, 119, 68)
+        self.cell(0, 10, text, ln=True)
+
+    def chart(self, png):
+        self.image(io.BytesIO(png), x=10, w=190)
+        self.ln(5)
+
+    def thank_you(self):
+        self.set_fill_color(204, 255, 204)
+        self.set_text_color(0, 119, 68)
+        self.set_font(FONT_FAMILY, 'B', 12)
+        self.cell(0, 10, THANK_YOU, ln=True, fill=True)
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        self.output(buffer)
+        return buffer.getvalue()
+
+
+def build_prediction_report(inputs, chart_png=None, notes="", include_importance=True, logo=None):
+    pdf = ReportPDF(logo)
+    pdf.add_page()
+    pdf.section_title("Input Parameters")
+    pdf.set_text_color(0, 0, 0)
+    pdf.set_font(FONT_FAMILY, '', 12)
+    pdf.cell(0, 8, f"Distance: {inputs['distance']} km", ln=True)
+    pdf.cell(0, 8, f"Engine Efficiency: {inputs['engine_efficiency']:.2f}", ln=True)
+    pdf.cell(0, 8, f"Fuel Type: {inputs['fuel_type']}", ln=True)
+    pdf.cell(0, 8, f"Emission Efficiency: {inputs['emission_efficiency']:.2f} kg CO₂/litre", ln=True)
+    pdf.cell(0, 8, f"Predicted CO2 Emission: {inputs['result']:.2f} kg", ln=True)
+    pdf.ln(5)
+    if notes:
+        pdf.section_title("Your Notes", size=12)
+        pdf.set_font(FONT_FAMILY, '', 11)
+        pdf.set_text_color(0, 0, 0)
+        pdf.multi_cell(0, 8, notes)
+        pdf.ln(2)
+    if chart_png is not None:
+        pdf.section_title("3D Emission Prediction Visualization")
+        pdf.chart(chart_png)
+    if include_importance:
+        pdf.section_title("Feature Importance (Random Forest)", size=12)
+        pdf.set_font(FONT_FAMILY, '', 11)
+        pdf.set_text_color(0, 0, 0)
+        for feature, importance in FEATURE_IMPORTANCES:
+            pdf.cell(0, 8, f"{feature}: {importance:.4f}", ln=True)
+        pdf.ln(3)
+    pdf.thank_you()
+    return pdf.to_bytes()
+
+
+def build_batch_report(first_row, rows, total, chart_png=None):
+    pdf = ReportPDF()
+    pdf.add_page()
+    pdf.section_title("Summary of Uploaded Data")
+    pdf.set_text_color(0, 0, 0)
+    pdf.set_font(FONT_FAMILY, '', 11)
+    for col, value in first_row.items():
+        pdf.cell(0, 8, f"{col}: {value}", ln=True)
+    pdf.cell(0, 8, f"Rows predicted: {rows:,}", ln=True)
+    pdf.cell(0, 8, f"Total predicted CO2 emission: {total:,.2f} kg", ln=True)
+    pdf.ln(3)
+    if chart_png is not None:
+        pdf.section_title("3D Emission Prediction Visualization", size=12)
+        pdf.chart(chart_png)
+    pdf.set_font(FONT_FAMILY, '', 11)
+    pdf.set_text_color(0, 0, 0)
+    pdf.multi_cell(0, 8, "This report provides a professional summary of your uploaded ship data and the predicted CO2 emissions, including a 3D visualization of the relationship between distance, engine efficiency, and emission efficiency. For more details, visit our website or contact the VNIT Nagpur team.")
+    pdf.ln(5)
+    pdf.thank_you()
+    return pdf.to_bytes()
+
+
+BUILDERS = {"prediction": build_prediction_report, "batch": build_batch_report}
+
+
+def _digest(value):
+    """Stable hash of JSON-like report inputs; bytes (logos) are hashed by content."""
+    def default(obj):
+        if isinstance(obj, (bytes, bytearray)):
+            return hashlib.sha256(obj).hexdigest()
+        if hasattr(obj, "item"):
+            return obj.item()
+        return str(obj)
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=default).encode("utf-8")).hexdigest()
+
+
+class ReportBuilder:
+    """Builds PDF reports on a background thread pool and caches them by input hash.
+
+    `submit()` returns immediately with a key; the same inputs map to the same
+    key, so a report is built at most once while it stays in the LRU cache.
+    `chart` is a zero-argument callable returning PNG bytes, called in the
+    worker only when the report is not cached.
+    """
+
+    def __init__(self, max_workers=2, max_cached=MAX_CACHED_REPORTS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report")
+        self._futures = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_cached = max_cached
+
+    @staticmethod
+    def key_for(kind, params, chart_key=None):
+        return _digest({"kind": kind, "params": params, "chart": chart_key})
+
+    def submit(self, kind, params, chart=None, chart_key=None):
+        key = self.key_for(kind, params, chart_key)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None and not (future.done() and future.exception() is not None):
+                self._futures.move_to_end(key)
+                return key
+            self._futures[key] = self._executor.submit(self._build, kind, params, chart)
+            while len(self._futures) > self.max_cached:
+                self._futures.popitem(last=False)
+        return key
+
+    @staticmethod
+    def _build(kind, params, chart):
+        with tracing.span("pdf_build", kind=kind):
+            with tracing.span("chart_png", kind=kind):
+                chart_png = chart() if chart is not None else None
+            return BUILDERS[kind](chart_png=chart_png, **params)
+
+    def get(self, key):
+        """The Future for a submitted report, or None if it was evicted."""
+        with self._lock:
+            return self._futures.get(key)
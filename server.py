@@ -0,0 +1,173 @@
+import json
+import logging
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import tracing
+from inference import FEATURE_NAMES, MODEL_FILES, as_features, load_model, resolve_model_name
+
+logger = logging.getLogger("co2.server")
+
+MAX_BATCH_ROWS = 65_536
+MAX_WAIT_MS = 2.0
+
+
+class _Pending:
+    def __init__(self, features):
+        self.features = features
+        self.done = threading.Event()
+        self.predictions = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Coalesce concurrent requests for one model into a single `predict` call.
+
+    A worker thread takes the first waiting request, then keeps collecting
+    until MAX_BATCH_ROWS rows are queued or `max_wait_ms` has passed, predicts
+    the concatenated rows once and hands each request its slice back.
+    """
+
+    def __init__(self, model, max_batch_rows=MAX_BATCH_ROWS, max_wait_ms=MAX_WAIT_MS):
+        self.model = model
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def predict(self, features):
+        pending = _Pending(features)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.predictions
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        rows = len(batch[0].features)
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch_rows:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(pending)
+            rows += len(pending.features)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                features = batch[0].features if len(batch) == 1 else np.concatenate([p.features for p in batch])
+                with tracing.span("predict", rows=len(features), model=type(self.model).__name__, stage="server"):
+                    predictions = self.model.predict(features)
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+                    pending.done.set()
+                continue
+            start = 0
+            for pending in batch:
+                end = start + len(pending.features)
+                pending.predictions = predictions[start:end]
+                start = end
+                pending.done.set()
+
+
+def parse_instances(payload):
+    """Accept either `instances` as rows of numbers or `rows` as objects keyed by feature name."""
+    if "instances" in payload:
+        return as_features(payload["instances"])
+    if "rows" in payload:
+        return as_features([[row[name] for name in FEATURE_NAMES] for row in payload["rows"]])
+    raise ValueError("Request body must contain 'instances' or 'rows'")
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    batchers = {}
+
+    def _send_json(self, status, body, latency_ms=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if latency_ms is not None:
+            self.send_header("X-Latency-Ms", f"{latency_ms:.3f}")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "models": list(self.batchers)})
+        elif self.path == "/metrics":
+            tracing.send_metrics(self)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        start = time.perf_counter()
+        if self.path != "/predict":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(payload, dict):
+                raise ValueError("Request body must be a JSON object")
+            model_name = payload.get("model", "Random Forest")
+            if not isinstance(model_name, str):
+                raise ValueError("'model' must be a string")
+            model_name = resolve_model_name(model_name)
+            features = parse_instances(payload)
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        try:
+            predictions = self.batchers[model_name].predict(features)
+        except Exception as e:
+            logger.exception("Prediction failed")
+            self._send_json(500, {"error": str(e)})
+            return
+        latency_ms = (time.perf_counter() - start) * 1000.0
+        self._send_json(200, {
+            "model": model_name,
+            "predictions": np.asarray(predictions, dtype=float).tolist(),
+            "latency_ms": round(latency_ms, 3),
+        }, latency_ms=latency_ms)
+        logger.info("%s rows=%d latency_ms=%.3f", model_name, len(features), latency_ms)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+class PredictionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+def make_server(host="127.0.0.1", port=8600, max_batch_rows=MAX_BATCH_ROWS, max_wait_ms=MAX_WAIT_MS):
+    # Load every model up front so the first request does not pay for unpickling.
+    batchers = {name: MicroBatcher(load_model(name), max_batch_rows, max_wait_ms) for name in MODEL_FILES}
+    handler = type("BoundPredictionHandler", (PredictionHandler,), {"batchers": batchers})
+    return PredictionServer((host, port), handler)
+
+
+def serve(host="127.0.0.1", port=8600, max_batch_rows=MAX_BATCH_ROWS, max_wait_ms=MAX_WAIT_MS):
+    server = make_server(host, port, max_batch_rows, max_wait_ms)
+    logger.info("Serving predictions on http://%s:%d/predict", host, port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,194 @@
+import hashlib
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from registry import BASE_DIR
+
+logger = logging.getLogger("co2.suggestions")
+
+SUGGESTIONS_DB = os.environ.get("CO2_SUGGESTIONS_DB") or os.path.join(BASE_DIR, "suggestions.db")
+PAGE_SIZE = 20
+MAX_BATCH = 256
+# Sort orders as the keyset columns of `suggestions`, all descending.
+ORDERS = {"newest": ("id",), "most_submitted": ("votes", "id")}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS suggestions (
+    id INTEGER PRIMARY KEY,
+    fingerprint TEXT NOT NULL UNIQUE,
+    text TEXT NOT NULL,
+    name TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    votes INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS suggestions_by_votes ON suggestions (votes DESC, id DESC);
+"""
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS suggestions_fts USING fts5(text, content='suggestions', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS suggestions_ai AFTER INSERT ON suggestions BEGIN
+    INSERT INTO suggestions_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS suggestions_ad AFTER DELETE ON suggestions BEGIN
+    INSERT INTO suggestions_fts (suggestions_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+
+def normalize_text(text):
+    """Case-, accent-, punctuation- and whitespace-insensitive form used to spot duplicates."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.findall(r"\w+", text))
+
+
+def fingerprint(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def _fts_query(query):
+    """Every word of `query` as a quoted prefix term, so user input is never parsed as FTS syntax."""
+    return " ".join('"' + token.replace('"', '""') + '"*' for token in re.findall(r"\w+", query))
+
+
+class _Pending:
+    def __init__(self, text, name):
+        self.text = text
+        self.name = name
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SuggestionStore:
+    """Policy suggestions in SQLite (WAL mode), shared by every session of the app.
+
+    Writes go through one writer thread that commits whatever submissions are
+    queued in a single transaction, so concurrent sessions never wait on each
+    other's write locks and the WAL is fsynced once per batch (synchronous=FULL
+    on the writer). Reads use a connection per thread and, with WAL, never
+    block on the writer.
+    Suggestions whose normalized text matches an existing one are counted as
+    another vote on it instead of stored again. Browsing and search page with
+    keyset cursors over indexed columns (and an FTS5 index when SQLite has it),
+    so the cost of a page does not grow with the number of suggestions.
+    """
+
+    def __init__(self, path=SUGGESTIONS_DB):
+        self.path = path
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        try:
+            conn.executescript(_FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            logger.warning("SQLite lacks FTS5; suggestion search falls back to LIKE scans")
+            self.has_fts = False
+        self._writer = threading.Thread(target=self._run, daemon=True, name="suggestions-writer")
+        self._writer.start()
+
+    def _connect(self, synchronous="NORMAL"):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={synchronous}")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def submit(self, text, name=None):
+        """Store a suggestion; returns {"id", "votes", "duplicate"} once it is committed."""
+        text = text.strip()
+        if not normalize_text(text):
+            raise ValueError("Suggestion cannot be empty")
+        pending = _Pending(text, (name or "").strip() or None)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        while len(batch) < MAX_BATCH:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        # FULL makes every COMMIT fsync the WAL, so a suggestion reported as stored survives a power loss.
+        conn = self._connect(synchronous="FULL")
+        while True:
+            batch = self._collect()
+            try:
+                now = time.time()
+                conn.execute("BEGIN IMMEDIATE")
+                for pending in batch:
+                    row = conn.execute(
+                        "INSERT INTO suggestions (fingerprint, text, name, created_at, updated_at) VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT (fingerprint) DO UPDATE SET votes = votes + 1, updated_at = excluded.updated_at "
+                        "RETURNING id, votes",
+                        (fingerprint(pending.text), pending.text, pending.name, now, now),
+                    ).fetchone()
+                    pending.result = {"id": row[0], "votes": row[1], "duplicate": row[1] > 1}
+                conn.execute("COMMIT")
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                logger.exception("Could not store %d suggestions", len(batch))
+                for pending in batch:
+                    pending.error = e
+            for pending in batch:
+                pending.done.set()
+
+    def page(self, query=None, order="newest", after=None, limit=PAGE_SIZE):
+        """One page of suggestions, plus the cursor for the next page (None on the last page).
+
+        `after` is the cursor returned with the previous page. With `query`,
+        only suggestions containing every word (as a prefix) are returned.
+        """
+        keys = ORDERS[order]
+        columns = [f"s.{k}" for k in keys]
+        source = "suggestions s"
+        where, params = [], []
+        if query and re.search(r"\w", query):
+            if self.has_fts:
+                # Driving the join from the index lets "newest" walk matches in rowid order and stop at the limit.
+                source = "suggestions_fts f JOIN suggestions s ON s.id = f.rowid"
+                columns = ["f.rowid" if c == "s.id" else c for c in columns]
+                where.append("suggestions_fts MATCH ?")
+                params.append(_fts_query(query))
+            else:
+                for token in re.findall(r"\w+", query):
+                    where.append("s.text LIKE ? ESCAPE '\\'")
+                    params.append("%" + re.sub(r"([%_\\])", r"\\\1", token) + "%")
+        if after is not None:
+            where.append(f"({', '.join(columns)}) < ({', '.join('?' * len(keys))})")
+            params.extend(after)
+        sql = f"SELECT s.id, s.text, s.name, s.votes, s.created_at, s.updated_at FROM {source}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY " + ", ".join(f"{c} DESC" for c in columns) + " LIMIT ?"
+        rows = [dict(r) for r in self._reader().execute(sql, params + [limit + 1])]
+        cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            cursor = tuple(rows[-1][k] for k in keys)
+        return rows, cursor
+
+    def count(self):
+        return self._reader().execute("SELECT count(*) FROM suggestions").fetchone()[0]
@@ -0,0 +1,121 @@
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from matplotlib.figure import Figure
+
+import tracing
+
+try:
+    import plotly.graph_objects as go
+except ImportError:
+    go = None
+
+TITLE = "3D Trade-off: Distance vs Efficiency vs Emissions"
+X_LABEL = "Distance (km)"
+Y_LABEL = "Engine Efficiency"
+Z_LABEL = "Predicted CO2 Emission (kg)"
+MAX_CACHED_PNGS = 32
+
+
+class SurfaceGrid:
+    """A predicted surface: axes `x` (columns) and `y` (rows) and `z` of shape (len(y), len(x))."""
+
+    def __init__(self, x, y, z):
+        self.x = np.asarray(x, dtype=np.float32)
+        self.y = np.asarray(y, dtype=np.float32)
+        self.z = np.asarray(z, dtype=np.float32)
+
+    @classmethod
+    def from_meshgrid(cls, x_grid, y_grid, z):
+        """Build from the (X, Y, Z) triple returned by `sweep.to_surface`."""
+        return cls(x_grid[0], y_grid[:, 0], z)
+
+    def to_long(self):
+        """One record per grid point, the layout Vega-Lite expects."""
+        x, y = np.meshgrid(self.x, self.y)
+        return {"distance": x.ravel().tolist(), "efficiency": y.ravel().tolist(), "co2": self.z.ravel().tolist()}
+
+
+def plotly_figure(grid, height=550):
+    """Interactive surface sent to the browser as the two axes plus the z matrix."""
+    fig = go.Figure(go.Surface(x=grid.x, y=grid.y, z=grid.z, colorscale="Viridis", colorbar={"title": "kg"}))
+    fig.update_layout(
+        title=TITLE,
+        height=height,
+        margin={"l": 0, "r": 0, "t": 40, "b": 0},
+        scene={"xaxis_title": X_LABEL, "yaxis_title": Y_LABEL, "zaxis_title": Z_LABEL},
+    )
+    return fig
+
+
+def vega_lite_spec(grid):
+    """Heatmap fallback when plotly is not installed; Vega-Lite ships with Streamlit."""
+    return {
+        "title": TITLE,
+        "data": {"values": [dict(zip(("distance", "efficiency", "co2"), row))
+                            for row in zip(*grid.to_long().values())]},
+        "mark": {"type": "rect"},
+        "encoding": {
+            "x": {"field": "distance", "type": "quantitative", "bin": {"maxbins": len(grid.x)}, "title": X_LABEL},
+            "y": {"field": "efficiency", "type": "quantitative", "bin": {"maxbins": len(grid.y)}, "title": Y_LABEL},
+            "color": {"field": "co2", "type": "quantitative", "scale": {"scheme": "viridis"}, "title": Z_LABEL},
+            "tooltip": [
+                {"field": "distance", "type": "quantitative", "format": ",.0f", "title": X_LABEL},
+                {"field": "efficiency", "type": "quantitative", "format": ".3f", "title": Y_LABEL},
+                {"field": "co2", "type": "quantitative", "format": ",.2f", "title": Z_LABEL},
+            ],
+        },
+    }
+
+
+def render_png(grid, figsize=(10, 6), dpi=100, colorbar=True):
+    """Rasterize the surface with matplotlib's object API.
+
+    The Figure is never registered with pyplot, so nothing outlives this call
+    and it is safe to run from the report worker threads.
+    """
+    fig = Figure(figsize=figsize)
+    try:
+        ax = fig.add_subplot(111, projection="3d")
+        x_grid, y_grid = np.meshgrid(grid.x, grid.y)
+        surf = ax.plot_surface(x_grid, y_grid, grid.z, cmap="viridis")
+        ax.set_title(TITLE)
+        ax.set_xlabel(X_LABEL)
+        ax.set_ylabel(Y_LABEL)
+        ax.set_zlabel(Z_LABEL)
+        if colorbar:
+            fig.colorbar(surf, shrink=0.5, aspect=10)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight")
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+
+class PngCache:
+    """LRU of rendered surface PNGs keyed by the inputs that produced the grid."""
+
+    def __init__(self, max_entries=MAX_CACHED_PNGS):
+        self.max_entries = max_entries
+        self._pngs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, grid, **options):
+        key = (key, tuple(sorted(options.items())))
+        with self._lock:
+            png = self._pngs.get(key)
+            if png is not None:
+                self._pngs.move_to_end(key)
+                return png
+        with tracing.span("surface_png"):
+            png = render_png(grid, **options)
+        with self._lock:
+            self._pngs[key] = png
+            while len(self._pngs) > self.max_entries:
+                self._pngs.popitem(last=False)
+        return png
+
+
+png_cache = PngCache()
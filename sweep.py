@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from inference import FEATURE_NAMES
+from uncertainty import DEFAULT_QUANTILES, predict_distribution
+
+PREDICTION = "prediction"
+DEFAULT_RESOLUTION = 30
+
+
+def scenario_grid(distance, engine_efficiency, emission_efficiency):
+    """Cartesian product of the three axes as one contiguous (n, 3) float32 array.
+
+    Each axis may be a scalar (held fixed) or a 1-D array of values. Rows vary
+    fastest along emission efficiency, then engine efficiency, then distance.
+    """
+    axes = [np.atleast_1d(np.asarray(a, dtype=np.float32)) for a in (distance, engine_efficiency, emission_efficiency)]
+    grid = np.empty([len(a) for a in axes] + [len(axes)], dtype=np.float32)
+    for i, values in enumerate(axes):
+        shape = [1] * len(axes)
+        shape[i] = len(values)
+        grid[..., i] = values.reshape(shape)
+    return grid.reshape(-1, len(axes))
+
+
+def scenario_sweep(model, distance, engine_efficiency, emission_efficiency, predict=None):
+    """Predict every combination of the given axes in a single batched call.
+
+    Returns a tidy frame with one row per scenario: the three feature columns
+    plus PREDICTION. `predict` overrides `model.predict`, e.g. to go through a
+    cache.
+    """
+    features = scenario_grid(distance, engine_efficiency, emission_efficiency)
+    predictions = (predict or model.predict)(features)
+    frame = pd.DataFrame(features, columns=FEATURE_NAMES)
+    frame[PREDICTION] = predictions
+    return frame
+
+
+def scenario_distribution(model, distance, engine_efficiency, emission_efficiency, quantiles=DEFAULT_QUANTILES):
+    """Like `scenario_sweep`, but with the forest's per-tree mean, std and quantiles for every scenario."""
+    features = scenario_grid(distance, engine_efficiency, emission_efficiency)
+    frame = pd.DataFrame(features, columns=FEATURE_NAMES)
+    return pd.concat([frame, predict_distribution(model, features, quantiles)], axis=1)
+
+
+def to_surface(frame, x="distance", y="engine_efficiency"):
+    """Reshape a two-axis sweep into the (X, Y, Z) grids expected by `plot_surface`."""
+    table = frame.pivot_table(index=y, columns=x, values=PREDICTION, sort=True)
+    x_grid, y_grid = np.meshgrid(table.columns.to_numpy(), table.index.to_numpy())
+    return x_grid, y_grid, table.to_numpy()
@@ -0,0 +1,247 @@
+import bisect
+import json
+import logging
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("co2.tracing")
+
+# Histogram bucket upper bounds in seconds.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRIC_PREFIX = "co2_"
+
+
+def _env_flag(name):
+    return os.environ.get(name, "").strip().lower() not in ("", "0", "false", "no")
+
+
+class Histogram:
+    """Fixed-bucket latency histogram, plus the rows processed by the timed calls."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.rows = 0
+
+    def observe(self, seconds, rows=None):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        if rows:
+            self.rows += rows
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation (capped at the observed max)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "labels", "rows", "start")
+
+    def __init__(self, tracer, name, labels, rows):
+        self.tracer = tracer
+        self.name = name
+        self.labels = labels
+        self.rows = rows
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        labels = self.labels if exc_type is None else dict(self.labels, error=exc_type.__name__)
+        self.tracer.observe(self.name, time.perf_counter() - self.start, self.rows, **labels)
+        return False
+
+
+class Tracer:
+    """Timed spans aggregated into per-(name, labels) histograms and counters.
+
+    When disabled, `span()` returns a shared no-op context manager and
+    `count()`/`observe()` return immediately, so instrumented code pays one
+    attribute check. When `log_path` is set every observation is also appended
+    to that file as one JSON line.
+    """
+
+    def __init__(self, enabled=False, log_path=None):
+        self.enabled = enabled
+        self.log_path = log_path
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._log = None
+
+    def span(self, name, rows=None, **labels):
+        if not self.enabled:
+            return _NOOP
+        return _Span(self, name, labels, rows)
+
+    def observe(self, name, seconds, rows=None, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds, rows)
+            if self.log_path:
+                self._write({"ts": time.time(), "span": name, "ms": seconds * 1000.0, "rows": rows, **labels})
+
+    def count(self, name, n=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def _write(self, record):
+        try:
+            if self._log is None:
+                self._log = open(self.log_path, "a", buffering=1)
+            self._log.write(json.dumps(record, default=str) + "\n")
+        except OSError as e:
+            logger.warning("Disabling trace log %s: %s", self.log_path, e)
+            self.log_path = None
+
+    def snapshot(self):
+        """One dict per histogram, slowest total time first."""
+        with self._lock:
+            items = [(key, h.count, h.sum, h.rows, h.max, h.quantile(0.5), h.quantile(0.95))
+                     for key, h in self.histograms.items()]
+        rows = []
+        for (name, labels), count, total, n_rows, slowest, p50, p95 in items:
+            rows.append({
+                "span": name,
+                "labels": ", ".join(f"{k}={v}" for k, v in labels),
+                "calls": count,
+                "total_ms": total * 1000.0,
+                "mean_ms": total * 1000.0 / count,
+                "p50_ms": p50 * 1000.0,
+                "p95_ms": p95 * 1000.0,
+                "max_ms": slowest * 1000.0,
+                "us_per_row": total * 1e6 / n_rows if n_rows else None,
+            })
+        return sorted(rows, key=lambda r: r["total_ms"], reverse=True)
+
+    def counter_snapshot(self):
+        with self._lock:
+            items = sorted(self.counters.items())
+        return [{"counter": name, "labels": ", ".join(f"{k}={v}" for k, v in labels), "value": value}
+                for (name, labels), value in items]
+
+    def prometheus_text(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            histograms = [(key, list(h.counts), h.count, h.sum, h.rows) for key, h in self.histograms.items()]
+            counters = list(self.counters.items())
+        lines = []
+        families = {}
+        for (name, labels), counts, count, total, n_rows in sorted(histograms):
+            families.setdefault(_metric_name(name), []).append((labels, counts, count, total, n_rows))
+        for base, series in families.items():
+            lines.append(f"# TYPE {base}_seconds histogram")
+            for labels, counts, count, total, _ in series:
+                cumulative = 0
+                for bound, n in zip(BUCKETS, counts):
+                    cumulative += n
+                    lines.append(f"{base}_seconds_bucket{_labels(labels, le=repr(bound))} {cumulative}")
+                lines.append(f"{base}_seconds_bucket{_labels(labels, le='+Inf')} {count}")
+                lines.append(f"{base}_seconds_sum{_labels(labels)} {total!r}")
+                lines.append(f"{base}_seconds_count{_labels(labels)} {count}")
+            if any(n_rows for *_, n_rows in series):
+                lines.append(f"# TYPE {base}_rows_total counter")
+                lines.extend(f"{base}_rows_total{_labels(labels)} {n_rows}" for labels, *_, n_rows in series if n_rows)
+        seen = set()
+        for (name, labels), value in sorted(counters):
+            base = _metric_name(name) + "_total"
+            if base not in seen:
+                seen.add(base)
+                lines.append(f"# TYPE {base} counter")
+            lines.append(f"{base}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+def _metric_name(name):
+    return METRIC_PREFIX + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{re.sub(r"[^a-zA-Z0-9_]", "_", k)}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+# CO2_TRACING=1 turns tracing on; setting a trace log or metrics port implies it.
+TRACE_LOG = os.environ.get("CO2_TRACE_LOG") or None
+METRICS_PORT = int(os.environ.get("CO2_METRICS_PORT") or 0)
+tracer = Tracer(enabled=_env_flag("CO2_TRACING") or bool(TRACE_LOG) or bool(METRICS_PORT), log_path=TRACE_LOG)
+
+# Module-level shortcuts, e.g. `with tracing.span("predict", rows=len(X), model=type(model).__name__): ...`.
+span = tracer.span
+observe = tracer.observe
+count = tracer.count
+
+
+def send_metrics(handler):
+    """Write the Prometheus text for `tracer` as the response of a BaseHTTPRequestHandler."""
+    data = tracer.prometheus_text().encode("utf-8")
+    handler.send_response(200)
+    handler.send_header("Content-Type", "text/plain; version=0.0.4")
+    handler.send_header("Content-Length", str(len(data)))
+    handler.end_headers()
+    handler.wfile.write(data)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            send_metrics(self)
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def start_metrics_server(port=METRICS_PORT, host="127.0.0.1"):
+    """Serve /metrics from a daemon thread; returns the server."""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    logger.info("Serving metrics on http://%s:%d/metrics", host, server.server_address[1])
+    return server
@@ -0,0 +1,263 @@
+import hashlib
+import json
+import logging
+import os
+import platform
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from joblib import dump
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import KFold, ParameterSampler, train_test_split
+from xgboost import XGBRegressor
+
+from features import FEATURED_DATA, FEATURED_COLUMNS, NORMALIZED_COLUMNS, RAW_DATA, TARGET, FeatureStats, featurize
+from flat_model import FLAT_SUFFIX
+from registry import BASE_DIR, BEST_MODEL
+
+logger = logging.getLogger("co2.train")
+
+ARTIFACTS_DIR = os.path.join(BASE_DIR, "artifacts")
+FEATURES = NORMALIZED_COLUMNS
+RANDOM_STATE = 42
+XGB_EARLY_STOPPING_ROUNDS = 30
+
+SEARCH_SPACES = {
+    "optimized_random_forest_model": {
+        "n_estimators": [50, 100, 200],
+        "max_depth": [None, 6, 10, 16],
+        "min_samples_split": [2, 5, 10],
+        "min_samples_leaf": [1, 2, 4],
+        "max_features": [1.0, "sqrt"],
+    },
+    "optimized_xgboost_model": {
+        "max_depth": [3, 4, 6, 8],
+        "learning_rate": [0.03, 0.05, 0.1, 0.2],
+        "subsample": [0.7, 0.85, 1.0],
+        "colsample_bytree": [0.7, 1.0],
+        "min_child_weight": [1, 3, 5],
+    },
+}
+
+
+def make_estimator(name, params, n_estimators=None):
+    if name == "optimized_random_forest_model":
+        return RandomForestRegressor(random_state=RANDOM_STATE, n_jobs=1, **params)
+    return XGBRegressor(
+        n_estimators=n_estimators or 1000,
+        objective="reg:squarederror",
+        random_state=RANDOM_STATE,
+        n_jobs=1,
+        **params,
+    )
+
+
+def evaluate_candidate(name, params, X, y, n_splits):
+    """Cross-validated RMSE of one candidate; XGBoost folds stop early on their validation split.
+
+    Runs inside a worker process, so it only takes picklable arguments.
+    """
+    scores = []
+    best_iterations = []
+    for train_idx, val_idx in KFold(n_splits, shuffle=True, random_state=RANDOM_STATE).split(X):
+        model = make_estimator(name, params)
+        if name == "optimized_xgboost_model":
+            model.set_params(early_stopping_rounds=XGB_EARLY_STOPPING_ROUNDS)
+            model.fit(X[train_idx], y[train_idx], eval_set=[(X[val_idx], y[val_idx])], verbose=False)
+            best_iterations.append(model.best_iteration + 1)
+        else:
+            model.fit(X[train_idx], y[train_idx])
+        scores.append(mean_squared_error(y[val_idx], model.predict(X[val_idx])) ** 0.5)
+    n_estimators = int(np.median(best_iterations)) if best_iterations else None
+    return float(np.mean(scores)), n_estimators
+
+
+def successive_halving(pool, name, X, y, n_candidates, eta=3, min_rows=200, n_splits=3):
+    """Successive-halving search: score every candidate on a small subsample, keep the best
+    1/eta, grow the subsample by eta and repeat until a round has scored on all rows.
+
+    Once a single candidate is left it is scored straight away on every row, so
+    its CV RMSE and XGBoost's early-stopping `n_estimators` (used for the final
+    refit on all rows) come from the full training data, not a subsample.
+    Each round's candidates are evaluated concurrently in `pool`.
+    """
+    rng = np.random.RandomState(RANDOM_STATE)
+    candidates = list(ParameterSampler(SEARCH_SPACES[name], n_candidates, random_state=RANDOM_STATE))
+    rows = min(len(X), min_rows)
+    history = []
+    while True:
+        subset = rng.choice(len(X), rows, replace=False) if rows < len(X) else np.arange(len(X))
+        futures = [pool.submit(evaluate_candidate, name, p, X[subset], y[subset], n_splits) for p in candidates]
+        results = [f.result() for f in futures]
+        ranked = sorted(zip(results, candidates), key=lambda r: r[0][0])
+        history.append({"rows": int(rows), "candidates": len(candidates), "best_rmse": ranked[0][0][0]})
+        logger.info("%s: %d candidates on %d rows, best cv rmse %.2f", name, len(candidates), rows, ranked[0][0][0])
+        if rows == len(X):
+            (rmse, n_estimators), params = ranked[0]
+            return params, n_estimators, rmse, history
+        candidates = [p for _, p in ranked[:max(1, len(candidates) // eta)]]
+        rows = len(X) if len(candidates) == 1 else min(len(X), rows * eta)
+
+
+def regression_metrics(y_true, y_pred):
+    return {
+        "rmse": float(mean_squared_error(y_true, y_pred) ** 0.5),
+        "mae": float(mean_absolute_error(y_true, y_pred)),
+        "r2": float(r2_score(y_true, y_pred)),
+    }
+
+
+def fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _search_and_fit(pool, name, X_train, y_train, X_test, y_test, n_candidates, workers):
+    """Run one model's search on the shared process pool, then refit on the full training split."""
+    start = time.perf_counter()
+    params, n_estimators, cv_rmse, history = successive_halving(pool, name, X_train, y_train, n_candidates)
+    search_s = time.perf_counter() - start
+    start = time.perf_counter()
+    model = make_estimator(name, params, n_estimators)
+    model.set_params(n_jobs=workers)
+    model.fit(X_train, y_train)
+    fit_s = time.perf_counter() - start
+    metrics = regression_metrics(y_test, model.predict(X_test))
+    metrics["cv_rmse"] = cv_rmse
+    params = dict(params, n_estimators=n_estimators or params.get("n_estimators"))
+    return model, params, metrics, history, {"search_s": search_s, "fit_s": fit_s}
+
+
+def run_pipeline(raw_path=None, out_dir=ARTIFACTS_DIR, n_candidates=27, test_size=0.2, workers=None, promote=False):
+    """Featurize the raw CSV, tune both models and write a versioned artifact directory.
+
+    Returns the path of the new `artifacts/<version>/` directory.
+    """
+    import sklearn
+    import xgboost
+
+    raw_path = raw_path or os.path.join(BASE_DIR, RAW_DATA)
+    workers = workers or os.cpu_count()
+    trained_at = datetime.now(timezone.utc)
+    version = trained_at.strftime("%Y%m%dT%H%M%SZ")
+    version_dir = os.path.join(out_dir, version)
+    os.makedirs(version_dir)
+    timings = {}
+
+    pipeline_start = start = time.perf_counter()
+    raw = pd.read_csv(raw_path)
+    stats = FeatureStats.fit(raw)
+    featured = featurize(raw, stats)
+    featured[FEATURED_COLUMNS].to_csv(os.path.join(version_dir, FEATURED_DATA), index=False)
+    stats.save(os.path.join(version_dir, "feature_stats.json"))
+    timings["featurize_s"] = time.perf_counter() - start
+
+    X = featured[FEATURES].to_numpy(dtype=np.float32)
+    y = featured[TARGET].to_numpy(dtype=np.float64)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=RANDOM_STATE)
+
+    # One driver thread per model feeds candidates into a single process pool sized to
+    # the machine, so both searches share every core.
+    with ProcessPoolExecutor(max_workers=workers) as pool, ThreadPoolExecutor(len(SEARCH_SPACES)) as drivers:
+        futures = {
+            name: drivers.submit(_search_and_fit, pool, name, X_train, y_train, X_test, y_test, n_candidates, workers)
+            for name in SEARCH_SPACES
+        }
+        results = {name: f.result() for name, f in futures.items()}
+
+    manifest = {
+        "version": version,
+        "trained_at": trained_at.isoformat(),
+        "raw_data": os.path.basename(raw_path),
+        "raw_data_sha256": fingerprint(raw_path),
+        "rows": int(len(featured)),
+        "test_size": test_size,
+        "random_state": RANDOM_STATE,
+        "workers": workers,
+        "versions": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "scikit-learn": sklearn.__version__,
+            "xgboost": xgboost.__version__,
+        },
+        "timings": timings,
+        "models": {},
+    }
+    for name, (model, params, metrics, history, model_timings) in results.items():
+        dump(model, os.path.join(version_dir, f"{name}.joblib"))
+        metadata = {
+            "model_type": type(model).__name__,
+            "feature_names": FEATURES,
+            "trained_at": trained_at.isoformat(),
+            "metrics": metrics,
+            "params": params,
+            "timings": model_timings,
+            "search": history,
+        }
+        with open(os.path.join(version_dir, f"{name}.json"), "w") as f:
+            json.dump(metadata, f, indent=2)
+        manifest["models"][name] = {"metrics": metrics, "timings": model_timings}
+        timings[f"{name}_s"] = sum(model_timings.values())
+
+    best = min(results, key=lambda n: results[n][2]["rmse"])
+    with open(os.path.join(version_dir, f"{BEST_MODEL}.json"), "w") as f:
+        json.dump({"alias": best}, f, indent=2)
+    timings["total_s"] = time.perf_counter() - pipeline_start
+    manifest["best_model"] = best
+    with open(os.path.join(version_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    logger.info("Wrote %s (best: %s, %.1fs)", version_dir, best, timings["total_s"])
+
+    if promote:
+        promote_version(version_dir)
+    return version_dir
+
+
+def evaluate_models(root=BASE_DIR, raw_path=None, test_size=0.2):
+    """Score every joblib model in `root` on run_pipeline's holdout split and record it in its `<name>.json`.
+
+    For models trained outside the pipeline (such as the bundled ones), so that
+    `best_model` can be ranked on the same metrics a training run records.
+    Returns {name: metrics}.
+    """
+    from registry import ModelRegistry
+
+    raw = pd.read_csv(raw_path or os.path.join(BASE_DIR, RAW_DATA))
+    featured = featurize(raw, FeatureStats.fit(raw))
+    X = featured[FEATURES].to_numpy(dtype=np.float32)
+    y = featured[TARGET].to_numpy(dtype=np.float64)
+    _, X_test, _, y_test = train_test_split(X, y, test_size=test_size, random_state=RANDOM_STATE)
+    registry = ModelRegistry(root)
+    results = {}
+    for name, entry in registry.entries.items():
+        if not entry.joblib_path:
+            continue
+        results[name] = metrics = regression_metrics(y_test, entry.load(format="joblib").predict(X_test))
+        metadata = dict(entry.metadata, metrics=metrics,
+                        evaluation={"raw_data": os.path.basename(raw_path or RAW_DATA), "test_size": test_size,
+                                    "random_state": RANDOM_STATE, "rows": int(len(y_test))})
+        with open(os.path.join(root, f"{name}.json"), "w") as f:
+            json.dump(metadata, f, indent=2)
+            f.write("\n")
+    return results
+
+
+def promote_version(version_dir, target_dir=BASE_DIR):
+    """Copy a trained version's models and metadata over the ones the app loads.
+
+    Flat exports of the replaced models are removed since they would be stale.
+    """
+    for name in SEARCH_SPACES:
+        shutil.rmtree(os.path.join(target_dir, name + FLAT_SUFFIX), ignore_errors=True)
+        for ext in (".joblib", ".json"):
+            shutil.copy2(os.path.join(version_dir, name + ext), os.path.join(target_dir, name + ext))
+    shutil.copy2(os.path.join(version_dir, f"{BEST_MODEL}.json"), os.path.join(target_dir, f"{BEST_MODEL}.json"))
+    logger.info("Promoted %s into %s", version_dir, target_dir)
@@ -0,0 +1,94 @@
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+import tracing
+from flat_model import FlatTreeEnsemble, from_sklearn_forest
+from inference import as_features
+
+DEFAULT_QUANTILES = (0.05, 0.5, 0.95)
+MEAN = "mean"
+STD = "std"
+# Rows per chunk are sized so each (rows, trees) block of leaf values stays around this many cells.
+MAX_CELLS = 2_000_000
+
+_forests = weakref.WeakKeyDictionary()
+_forests_lock = threading.Lock()
+
+
+def quantile_column(q):
+    return f"p{q * 100:g}"
+
+
+def supports_intervals(model):
+    """Whether per-tree estimates of `model` are a sample to take intervals from (bagged forests only)."""
+    if isinstance(model, FlatTreeEnsemble):
+        return model.aggregation == "mean"
+    return hasattr(model, "estimators_")
+
+
+def as_forest(model):
+    """The flat-array view of a Random Forest, built once per model object.
+
+    Boosted trees are rejected: their per-tree outputs are additive corrections,
+    not independent estimates, so their spread says nothing about uncertainty.
+    """
+    if not supports_intervals(model):
+        raise ValueError(f"Prediction intervals need a Random Forest, not {type(model).__name__}")
+    if isinstance(model, FlatTreeEnsemble):
+        return model
+    with _forests_lock:
+        forest = _forests.get(model)
+        if forest is None:
+            forest = _forests[model] = from_sklearn_forest(model)
+    return forest
+
+
+def per_tree_predictions(model, X):
+    """Every tree's estimate for every row of `X`, shape (n_rows, n_trees), from one traversal.
+
+    sklearn forests find all leaves with `apply()` (compiled, all trees in one
+    call); the flat view maps those per-tree leaf ids to global node ids via
+    `roots`, so the values come from one gather.
+    """
+    forest = as_forest(model)
+    if forest is model:
+        return forest.predict_per_tree(X)
+    return forest.value.take(model.apply(X) + forest.roots)
+
+
+def _sorted_quantiles(values, quantiles):
+    """np.quantile's default (linear) method on rows that are already sorted."""
+    position = np.asarray(quantiles) * (values.shape[1] - 1)
+    lower = np.floor(position).astype(np.intp)
+    upper = np.minimum(lower + 1, values.shape[1] - 1)
+    weight = position - lower
+    return values[:, lower] * (1 - weight) + values[:, upper] * weight
+
+
+def predict_distribution(model, X, quantiles=DEFAULT_QUANTILES):
+    """Mean, standard deviation and quantiles of the per-tree predictions for every row of `X`.
+
+    Rows are processed in blocks; each block is a single traversal of all trees
+    followed by reductions along the tree axis, so the cost stays close to one
+    `predict`. Returns a frame with MEAN, STD and one `quantile_column(q)` per
+    quantile; MEAN equals the forest's `predict`.
+    """
+    forest = as_forest(model)
+    X = as_features(X)
+    out = np.empty((len(X), 2 + len(quantiles)), dtype=np.float64)
+    step = max(1, MAX_CELLS // forest.n_trees)
+    with tracing.span("predict_distribution", rows=len(X), model=type(model).__name__):
+        for start in range(0, len(X), step):
+            per_tree = per_tree_predictions(model, X[start:start + step])
+            block = out[start:start + len(per_tree)]
+            # One pass each for the sum and the sum of squares, instead of std's mean-then-deviations.
+            mean = per_tree.sum(axis=1) / forest.n_trees
+            block[:, 0] = mean
+            block[:, 1] = np.sqrt(np.maximum(np.einsum("ij,ij->i", per_tree, per_tree) / forest.n_trees - mean**2, 0.0))
+            if quantiles:
+                per_tree.sort(axis=1)
+                block[:, 2:] = _sorted_quantiles(per_tree, quantiles)
+    return pd.DataFrame(out, columns=[MEAN, STD] + [quantile_column(q) for q in quantiles])